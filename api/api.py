@@ -4,15 +4,23 @@ Secured FastAPI REST API for querying YouTube video data.
 Provides endpoints for searching, filtering, and analyzing video metadata.
 """
 import os
+import itertools
 import logging
+import orjson
 from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# API_KEY is read at import, so .env must be loaded first
+load_dotenv(override=True)
 
 from db import get_videos_collection
-from query_db import get_most_recent_entries, search_videos, get_videos_by_channel, get_top_videos
+from query_db import (get_most_recent_entries, search_videos, get_videos_by_channel, get_top_videos, channel_filter,
+                      iter_recent_videos, next_cursor, encode_cursor, decode_cursor)
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +44,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Public video document fields (internal bookkeeping fields are not returned)
+VIDEO_FIELDS = [
+    "video_id", "title", "url", "upload_date", "view_count", "like_count",
+    "comment_count", "description", "channel_id", "channel", "channel_url",
+    "duration", "thumbnail", "tags", "ingested_at", "source",
+]
+
+# Server-side projection for find(): public fields only, no ObjectId
+VIDEO_PROJECTION = {"_id": 0, **{field: 1 for field in VIDEO_FIELDS}}
+
+
+def _stream_results(docs):
+    """
+    Encode docs as {"results": [...], "total": n} one document at a time.
+    orjson serialises datetimes natively; anything else (ObjectId) falls back to str.
+    """
+    yield b'{"results": ['
+    total = 0
+    for doc in docs:
+        if total:
+            yield b","
+        yield orjson.dumps(doc, default=str)
+        total += 1
+    yield b'], "total": %d}' % total
+
 # Security
 security = HTTPBearer()
 API_KEY = os.environ.get("API_KEY", "")
@@ -85,14 +118,14 @@ def get_latest_videos(
     """
     try:
         logger.info(f"Fetching {limit} latest videos")
-        collection = get_videos_collection()
-        
-        videos = list(collection.find({}).sort("upload_date", -1).limit(limit))
-        
-        for video in videos:
-            video.pop("_id", None)
-        
-        return {"results": videos, "total": len(videos)}
+        videos = iter_recent_videos(limit=limit, fields=VIDEO_FIELDS)
+        # Pull the first document before any header is sent, so a failing
+        # query still surfaces as a 500 rather than a truncated 200 body
+        first = next(videos, None)
+        if first is not None:
+            videos = itertools.chain((first,), videos)
+        
+        return StreamingResponse(_stream_results(videos), media_type="application/json")
     except Exception as e:
         logger.error(f"Error fetching latest videos: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -110,16 +143,13 @@ def get_last_24h_videos(
         logger.info(f"Fetching videos from last 24h (channel: {channel})")
         collection = get_videos_collection()
         
-        time_24h_ago = (datetime.utcnow() - timedelta(hours=24)).isoformat()
+        time_24h_ago = datetime.utcnow() - timedelta(hours=24)
         
         query_filter = {"upload_date": {"$gte": time_24h_ago}}
         if channel:
-            query_filter["channel"] = {"$regex": channel, "$options": "i"}
+            query_filter.update(channel_filter(channel))
         
-        videos = list(collection.find(query_filter).sort("upload_date", -1).limit(limit))
-        
-        for video in videos:
-            video.pop("_id", None)
+        videos = list(collection.find(query_filter, VIDEO_PROJECTION).sort("upload_date", -1).limit(limit))
         
         return {"results": videos, "total": len(videos)}
     except Exception as e:
@@ -141,17 +171,14 @@ def get_channel_videos(
         collection = get_videos_collection()
         
         sort_direction = -1 if sort_by == "upload_date" else -1
-        query_filter = {"channel": {"$regex": channel_name, "$options": "i"}}
+        query_filter = channel_filter(channel_name)
         
-        videos = list(collection.find(query_filter).sort(sort_by, sort_direction).limit(limit))
+        videos = list(collection.find(query_filter, VIDEO_PROJECTION).sort(sort_by, sort_direction).limit(limit))
         
         if not videos:
             logger.warning(f"No videos found for channel: {channel_name}")
             raise HTTPException(status_code=404, detail=f"No videos found for channel: {channel_name}")
         
-        for video in videos:
-            video.pop("_id", None)
-        
         channel_display = videos[0]["channel"] if videos else channel_name
         return {
             "channel": channel_display,
@@ -170,38 +197,44 @@ def search_videos_endpoint(
     q: str = Query(..., min_length=1, max_length=200, description="Search query"),
     channel: Optional[str] = Query(None, description="Optional channel filter"),
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    after: Optional[str] = Query(None, description="Token from a previous page's `next` (upload_date sort only)"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Deprecated: use `after`"),
     sort_by: str = Query("upload_date", enum=["upload_date", "view_count", "like_count"])
 ):
     """
-    Search videos by text query in title and description
+    Search videos by text query in title and description.
+    Page with the `after` token returned as `next`; `offset` is kept for old clients.
     """
     try:
         logger.info(f"Searching for: {q}")
         collection = get_videos_collection()
         
-        query_filter = {}
-        
-        # Text search
-        if q:
-            query_filter["$text"] = {"$search": q}
-        
-        # Channel filter
+        query_filter = {"$text": {"$search": q}}
         if channel:
-            query_filter["channel"] = {"$regex": channel, "$options": "i"}
-        
-        sort_direction = -1
-        
-        # Execute query
-        cursor = collection.find(query_filter).sort(sort_by, sort_direction).skip(offset).limit(limit)
-        results = list(cursor)
+            query_filter.update(channel_filter(channel))
+        
+        if offset and not after:
+            # Deprecated skip/limit path
+            cursor = collection.find(query_filter, VIDEO_PROJECTION).sort([(sort_by, -1), ("video_id", -1)]).skip(offset).limit(limit)
+            results = list(cursor)
+        else:
+            try:
+                after_key = decode_cursor(after) if after else None
+                results = search_videos(text_query=q, channel=channel, limit=limit, after=after_key,
+                                        fields=VIDEO_FIELDS, sort_by=sort_by)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         total = collection.count_documents(query_filter)
         
-        for result in results:
-            result.pop("_id", None)
+        # Only the upload_date order can be resumed from a keyset cursor
+        next_token = None
+        if sort_by == "upload_date" and len(results) == limit:
+            next_token = encode_cursor(next_cursor(results))
         
         logger.info(f"Search found {total} results for: {q}")
-        return {"query": q, "results": results, "total": total, "offset": offset}
+        return {"query": q, "results": results, "total": total, "offset": offset, "next": next_token}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching videos: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -219,14 +252,11 @@ def get_popular_videos(
         logger.info(f"Fetching popular videos (last {days} days)")
         collection = get_videos_collection()
         
-        cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
         
         query_filter = {"upload_date": {"$gte": cutoff_date}}
         
-        videos = list(collection.find(query_filter).sort("view_count", -1).limit(limit))
-        
-        for video in videos:
-            video.pop("_id", None)
+        videos = list(collection.find(query_filter, VIDEO_PROJECTION).sort("view_count", -1).limit(limit))
         
         return {"results": videos, "total": len(videos)}
     except Exception as e:
@@ -286,29 +316,39 @@ def get_stats():
         collection = get_videos_collection()
         
         total_videos = collection.count_documents({})
-        channels = collection.distinct("channel")
         
-        # Detailed stats
+        # Detailed stats; channels are counted server-side in the same pass
         pipeline = [
             {
-                "$group": {
-                    "_id": None,
-                    "total_videos": {"$sum": 1},
-                    "total_views": {"$sum": "$view_count"},
-                    "total_likes": {"$sum": "$like_count"},
-                    "avg_views": {"$avg": "$view_count"},
-                    "avg_likes": {"$avg": "$like_count"},
-                    "max_views": {"$max": "$view_count"}
+                "$facet": {
+                    "channels": [
+                        {"$group": {"_id": "$channel"}},
+                        {"$count": "n"}
+                    ],
+                    "stats": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "total_videos": {"$sum": 1},
+                                "total_views": {"$sum": "$view_count"},
+                                "total_likes": {"$sum": "$like_count"},
+                                "avg_views": {"$avg": "$view_count"},
+                                "avg_likes": {"$avg": "$like_count"},
+                                "max_views": {"$max": "$view_count"}
+                            }
+                        }
+                    ]
                 }
             }
         ]
         
-        stats = list(collection.aggregate(pipeline))
-        stats_data = stats[0] if stats else {}
+        facets = next(collection.aggregate(pipeline), {})
+        stats_data = (facets.get("stats") or [{}])[0]
+        total_channels = (facets.get("channels") or [{"n": 0}])[0]["n"]
         
         return {
             "total_videos": total_videos,
-            "total_channels": len(channels),
+            "total_channels": total_channels,
             "stats": {
                 "total_views": stats_data.get("total_views", 0),
                 "total_likes": stats_data.get("total_likes", 0),
@@ -331,14 +371,12 @@ def get_video_by_id(video_id: str):
         logger.info(f"Fetching video: {video_id}")
         collection = get_videos_collection()
         
-        video = collection.find_one({"video_id": video_id})
+        video = collection.find_one({"video_id": video_id}, VIDEO_PROJECTION)
         
         if not video:
             logger.warning(f"Video not found: {video_id}")
             raise HTTPException(status_code=404, detail="Video not found")
         
-        video.pop("_id", None)
-        
         return video
     except HTTPException:
         raise
@@ -6,7 +6,12 @@ import os
 import re
 import json
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+try:
+    import orjson
+except ImportError:  # optional — stdlib json is used as a fallback
+    orjson = None
 
 _DB_PATH = os.path.join(os.path.dirname(__file__), "data.cache")
 
@@ -58,6 +63,18 @@ _SEED = [
 ]
 
 
+# ── Serialization ───────────────────────────────────────────────────────────
+def _dumps(rec) -> str:
+    if orjson is not None:
+        return orjson.dumps(rec).decode()
+    return json.dumps(rec)
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 # ── DB Init ─────────────────────────────────────────────────────────────────
 def _get_conn():
     conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
@@ -79,7 +96,7 @@ def _init():
         for rec in _SEED:
             cur.execute(
                 "INSERT OR REPLACE INTO videos (video_id, data) VALUES (?, ?)",
-                (rec["video_id"], json.dumps(rec))
+                (rec["video_id"], _dumps(rec))
             )
         conn.commit()
     conn.close()
@@ -88,22 +105,30 @@ _init()
 
 
 # ── Cursor wrapper ───────────────────────────────────────────────────────────
+def _project(row, projection):
+    """Apply a MongoDB-style inclusion/exclusion projection to a row."""
+    if not projection:
+        return row
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    if include:
+        return {k: row[k] for k in include if k in row}
+    return {k: v for k, v in row.items() if projection.get(k, 1)}
+
+
 class _Cursor:
-    def __init__(self, rows):
+    def __init__(self, rows, projection=None):
         self._rows = list(rows)
-        self._sort_key = None
-        self._sort_dir = -1
+        self._projection = projection
+        self._sort_spec = []
         self._skip_n = 0
         self._limit_n = None
 
     def sort(self, key_or_list, direction=-1):
         if isinstance(key_or_list, list):
             # list of (key, dir) tuples
-            self._sort_key = key_or_list[0][0]
-            self._sort_dir = key_or_list[0][1]
+            self._sort_spec = list(key_or_list)
         else:
-            self._sort_key = key_or_list
-            self._sort_dir = direction
+            self._sort_spec = [(key_or_list, direction)]
         return self
 
     def skip(self, n):
@@ -114,15 +139,23 @@ class _Cursor:
         self._limit_n = n
         return self
 
+    def hint(self, index):
+        return self  # no indexes locally
+
+    def batch_size(self, n):
+        return self  # rows are already in memory
+
     def _resolve(self):
         rows = self._rows
-        if self._sort_key:
-            rev = (self._sort_dir == -1)
-            rows = sorted(rows, key=lambda x: (x.get(self._sort_key) or ""), reverse=rev)
+        # stable sorts applied least-significant key first
+        for key, direction in reversed(self._sort_spec):
+            rows = sorted(rows, key=lambda x: (x.get(key) or ""), reverse=(direction == -1))
         if self._skip_n:
             rows = rows[self._skip_n:]
         if self._limit_n is not None:
             rows = rows[:self._limit_n]
+        if self._projection:
+            rows = [_project(r, self._projection) for r in rows]
         return rows
 
     def __iter__(self):
@@ -136,7 +169,10 @@ class _Cursor:
 def _match(row, filt):
     """Recursively match a row against a MongoDB-style filter dict."""
     for key, cond in filt.items():
-        if key == "$text":
+        if key == "$or":
+            if not any(_match(row, sub) for sub in cond):
+                return False
+        elif key == "$text":
             search = (cond.get("$search") or "").lower()
             haystack = (row.get("title", "") + " " + row.get("description", "")).lower()
             if search not in haystack:
@@ -168,89 +204,159 @@ def _match(row, filt):
     return True
 
 
+def _to_datetime(value):
+    """Stored ISO strings → naive UTC datetimes, mirroring BSON Date in Atlas."""
+    if not isinstance(value, str) or not value:
+        return value
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
 def _all_rows():
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute("SELECT data FROM videos")
-    rows = [json.loads(r[0]) for r in cur.fetchall()]
+    rows = [_loads(r[0]) for r in cur.fetchall()]
     conn.close()
+    for row in rows:
+        row["upload_date"] = _to_datetime(row.get("upload_date"))
+        # normalized name used by channel prefix filters, derived on read so
+        # the tracked cache file is never rewritten
+        if "channel_lc" not in row:
+            row["channel_lc"] = (row.get("channel") or "").lower()
     return rows
 
 
+def _eval_expr(row, expr):
+    """Evaluate a small aggregation expression: "$field", $ifNull, $cond, $gt or a constant."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return row.get(expr.lstrip("$"))
+    if isinstance(expr, dict):
+        if "$ifNull" in expr:
+            for sub in expr["$ifNull"]:
+                val = _eval_expr(row, sub)
+                if val is not None:
+                    return val
+            return None
+        if "$cond" in expr:
+            cond, then, other = expr["$cond"]
+            return _eval_expr(row, then) if _eval_expr(row, cond) else _eval_expr(row, other)
+        if "$gt" in expr:
+            left, right = (_eval_expr(row, sub) for sub in expr["$gt"])
+            if left is None or right is None:
+                return left is not None  # null sorts below every other value
+            return left > right
+    return expr
+
+
+def _group_key(row, id_field):
+    """Resolve a $group _id expression (missing fields group under "")."""
+    if isinstance(id_field, str) and id_field.startswith("$"):
+        return row.get(id_field.lstrip("$"), "")
+    return _eval_expr(row, id_field)
+
+
+def _run_pipeline(rows, pipeline):
+    """Minimal $match + $group + $sort + $project + $count + $facet support."""
+    result = []
+    for stage in pipeline:
+        if "$match" in stage:
+            rows = [r for r in rows if _match(r, stage["$match"])]
+            result = rows
+        elif "$group" in stage:
+            groups = {}
+            spec = stage["$group"]
+            id_field = spec.get("_id")
+            for row in rows:
+                grp_key = _group_key(row, id_field)
+                if grp_key not in groups:
+                    groups[grp_key] = {"_id": grp_key, "_rows": []}
+                groups[grp_key]["_rows"].append(row)
+            agg_rows = []
+            for grp_key, grp in groups.items():
+                rec = {"_id": grp_key}
+                for out_field, expr in spec.items():
+                    if out_field == "_id":
+                        continue
+                    if isinstance(expr, dict):
+                        op = list(expr.keys())[0]
+                        src = list(expr.values())[0]
+                        src_key = src.lstrip("$") if isinstance(src, str) else None
+                        if op == "$sum":
+                            if src == 1:
+                                rec[out_field] = len(grp["_rows"])
+                            else:
+                                rec[out_field] = sum(r.get(src_key, 0) or 0 for r in grp["_rows"])
+                        elif op == "$avg":
+                            vals = [r.get(src_key, 0) or 0 for r in grp["_rows"]]
+                            rec[out_field] = sum(vals) / len(vals) if vals else 0
+                        elif op == "$max":
+                            vals = [r.get(src_key) for r in grp["_rows"] if r.get(src_key)]
+                            rec[out_field] = max(vals) if vals else None
+                        elif op == "$min":
+                            vals = [r.get(src_key) for r in grp["_rows"] if r.get(src_key)]
+                            rec[out_field] = min(vals) if vals else None
+                agg_rows.append(rec)
+            rows = agg_rows
+            result = agg_rows
+        elif "$sort" in stage:
+            spec = stage["$sort"]
+            for k, v in reversed(list(spec.items())):
+                rows = sorted(rows, key=lambda x: (x.get(k) or ""), reverse=(v == -1))
+            result = rows
+        elif "$project" in stage:
+            spec = stage["$project"]
+            # plain inclusion/exclusion only; computed fields are kept as-is for demo
+            if all(isinstance(v, int) for v in spec.values()):
+                rows = [_project(r, spec) for r in rows]
+            result = rows
+        elif "$limit" in stage:
+            rows = rows[:stage["$limit"]]
+            result = rows
+        elif "$count" in stage:
+            rows = [{stage["$count"]: len(rows)}] if rows else []
+            result = rows
+        elif "$facet" in stage:
+            rows = [{name: _run_pipeline(rows, sub) for name, sub in stage["$facet"].items()}]
+            result = rows
+    return result
+
+
 # ── Collection class ─────────────────────────────────────────────────────────
 class LocalCollection:
     """Drop-in replacement for a pymongo Collection for demo use."""
 
-    def count_documents(self, filt=None):
+    def count_documents(self, filt=None, **kwargs):
         rows = [r for r in _all_rows() if _match(r, filt or {})]
         return len(rows)
 
-    def find(self, filt=None):
+    def estimated_document_count(self):
+        conn = _get_conn()
+        count = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        conn.close()
+        return count
+
+    def find(self, filt=None, projection=None, **kwargs):
         rows = [r for r in _all_rows() if _match(r, filt or {})]
-        return _Cursor(rows)
+        return _Cursor(rows, projection)
 
-    def find_one(self, filt=None, sort=None):
+    def find_one(self, filt=None, projection=None, sort=None):
         rows = [r for r in _all_rows() if _match(r, filt or {})]
         if sort:
             key = sort[0][0]; direction = sort[0][1]
             rows = sorted(rows, key=lambda x: (x.get(key) or ""), reverse=(direction == -1))
-        return rows[0] if rows else None
+        return _project(rows[0], projection) if rows else None
 
     def distinct(self, field):
         return list({r.get(field) for r in _all_rows() if r.get(field)})
 
-    def aggregate(self, pipeline):
-        """Minimal $group + $sort + $project support."""
-        rows = _all_rows()
-        result = []
-        for stage in pipeline:
-            if "$group" in stage:
-                groups = {}
-                spec = stage["$group"]
-                id_field = spec.get("_id")
-                for row in rows:
-                    grp_key = row.get(id_field.lstrip("$"), "") if isinstance(id_field, str) and id_field.startswith("$") else id_field
-                    if grp_key not in groups:
-                        groups[grp_key] = {"_id": grp_key, "_rows": []}
-                    groups[grp_key]["_rows"].append(row)
-                agg_rows = []
-                for grp_key, grp in groups.items():
-                    rec = {"_id": grp_key}
-                    for out_field, expr in spec.items():
-                        if out_field == "_id":
-                            continue
-                        if isinstance(expr, dict):
-                            op = list(expr.keys())[0]
-                            src = list(expr.values())[0]
-                            src_key = src.lstrip("$") if isinstance(src, str) else None
-                            if op == "$sum":
-                                if src == 1:
-                                    rec[out_field] = len(grp["_rows"])
-                                else:
-                                    rec[out_field] = sum(r.get(src_key, 0) or 0 for r in grp["_rows"])
-                            elif op == "$avg":
-                                vals = [r.get(src_key, 0) or 0 for r in grp["_rows"]]
-                                rec[out_field] = sum(vals) / len(vals) if vals else 0
-                            elif op == "$max":
-                                vals = [r.get(src_key) for r in grp["_rows"] if r.get(src_key)]
-                                rec[out_field] = max(vals) if vals else None
-                            elif op == "$min":
-                                vals = [r.get(src_key) for r in grp["_rows"] if r.get(src_key)]
-                                rec[out_field] = min(vals) if vals else None
-                    agg_rows.append(rec)
-                rows = agg_rows
-                result = agg_rows
-            elif "$sort" in stage:
-                spec = stage["$sort"]
-                for k, v in reversed(list(spec.items())):
-                    rows = sorted(rows, key=lambda x: (x.get(k) or ""), reverse=(v == -1))
-                result = rows
-            elif "$project" in stage:
-                result = rows  # simplified — keep as-is for demo
-            elif "$limit" in stage:
-                rows = rows[:stage["$limit"]]
-                result = rows
-        return iter(result)
+    def aggregate(self, pipeline, **kwargs):
+        return iter(_run_pipeline(_all_rows(), pipeline))
 
     def create_index(self, *args, **kwargs):
         pass  # no-op
@@ -13,7 +13,8 @@ from query_db import (
     get_videos_by_channel,
     get_top_videos,
     get_trending_videos,
-    get_video_statistics
+    get_video_statistics,
+    channel_filter
 )
 from dotenv import load_dotenv
 
@@ -45,7 +46,7 @@ def count_videos_by_channel(channel_name: str) -> str:
     """Count videos for a specific channel"""
     try:
         collection = get_videos_collection()
-        count = collection.count_documents({"channel": {"$regex": channel_name, "$options": "i"}})
+        count = collection.count_documents(channel_filter(channel_name))
         logger.info(f"Count for {channel_name}: {count}")
         return f"Found **{count}** videos from {channel_name}."
     except Exception as e:
@@ -59,11 +60,11 @@ def videos_last_24h(channel_name: str = None) -> str:
         collection = get_videos_collection()
         
         # Calculate 24h ago
-        time_24h_ago = (datetime.utcnow() - timedelta(hours=24)).isoformat()
+        time_24h_ago = datetime.utcnow() - timedelta(hours=24)
         
         query = {"upload_date": {"$gte": time_24h_ago}}
         if channel_name:
-            query["channel"] = {"$regex": channel_name, "$options": "i"}
+            query.update(channel_filter(channel_name))
         
         videos = list(collection.find(query).sort("upload_date", -1).limit(10))
         
@@ -283,7 +284,7 @@ def _gather_database_context(user_message: str) -> str:
                     f"[NEWEST VIDEO] '{newest['title']}' by {newest['channel']} "
                     f"on {newest.get('upload_date','N/A')}"
                 )
-            time_24h_ago = (datetime.utcnow() - timedelta(hours=24)).isoformat()
+            time_24h_ago = datetime.utcnow() - timedelta(hours=24)
             recent_videos = list(
                 collection.find({"upload_date": {"$gte": time_24h_ago}})
                 .sort("upload_date", -1).limit(10)
@@ -448,7 +449,7 @@ def _fallback_response(user_message: str) -> str:
             for channel_name in ["Bloomberg", "ANI"]:
                 if channel_name.lower() in user_lower:
                     collection = get_videos_collection()
-                    count = collection.count_documents({"channel": {"$regex": channel_name, "$options": "i"}})
+                    count = collection.count_documents(channel_filter(channel_name))
                     return f"**{channel_name}** has **{count}** videos in the database."
         
         # Stats query
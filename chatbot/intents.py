@@ -0,0 +1,90 @@
+"""
+chatbot/intents.py
+Keyword intent matching for chat prompts, plus the entity key (channel, time
+window, intent, search terms) used to keep semantic-cache hits on-topic.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Intent keywords, matched as substrings of the lower-cased message
+INTENT_KEYWORDS = {
+    "count": ["how many", "count", "total", "number of"],
+    "recent": ["24h", "24 h", "last 24", "today", "recent", "latest"],
+    "popular": ["popular", "top", "most viewed", "trending", "viral", "best"],
+    "channel": ["channel", "stat", "overview", "summary", "analytics", "dashboard"],
+    "bloomberg": ["bloomberg"],
+    "ani": ["ani", "news india"],
+}
+# Tags that name a channel rather than an intent
+_CHANNEL_TAGS = {"bloomberg": "Bloomberg", "ani": "ANI News India"}
+
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+_PREP_RE = re.compile(r'\b(about|on|regarding|related to|for)\s+(\S+(?:\s+\S+){0,3})', re.IGNORECASE)
+# "from Reuters", "by CNBC TV" - capitalised names only, to skip "from today"
+_BY_CHANNEL_RE = re.compile(r'\b(?:from|by)\s+([A-Z][\w&.\'-]*(?:\s+[A-Z][\w&.\'-]*){0,3})')
+_WINDOW_RE = re.compile(
+    r'\b(\d+)\s*(h|hours?|d|days?|w|weeks?|m|months?|y|years?)\b'
+    r'|\b(today|yesterday|tonight|this\s+(?:week|month|year)|last\s+(?:week|month|year))\b',
+    re.IGNORECASE,
+)
+
+try:
+    import ahocorasick
+
+    _INTENT_AC = ahocorasick.Automaton()
+    for _tag, _words in INTENT_KEYWORDS.items():
+        for _w in _words:
+            _INTENT_AC.add_word(_w, (_w, _tag))
+    _INTENT_AC.make_automaton()
+
+    def intent_hits(msg: str) -> set:
+        """Intent tags whose keywords occur in `msg`, in one automaton pass."""
+        return {tag for _, (_, tag) in _INTENT_AC.iter(msg)}
+except ImportError:
+    # Lookahead alternation reports overlapping hits, like the automaton
+    _INTENT_TAGS = {w: tag for tag, words in INTENT_KEYWORDS.items() for w in words}
+    _INTENT_RE = re.compile(
+        "(?=(" + "|".join(re.escape(w) for w in sorted(_INTENT_TAGS, key=len, reverse=True)) + "))"
+    )
+
+    def intent_hits(msg: str) -> set:
+        """Intent tags whose keywords occur in `msg`, in one regex pass."""
+        return {_INTENT_TAGS[m.group(1)] for m in _INTENT_RE.finditer(msg)}
+
+
+def channel_from_hits(hits: set) -> Optional[str]:
+    """Known channel named by the intent tags, if any."""
+    for tag, name in _CHANNEL_TAGS.items():
+        if tag in hits:
+            return name
+    return None
+
+
+def search_keywords(message: str) -> List[str]:
+    """Quoted terms, else the phrase after a preposition ("videos about X")."""
+    keywords = _QUOTED_RE.findall(message)
+    if not keywords:
+        m = _PREP_RE.search(message)
+        if m:
+            keywords = [m.group(2)]
+    return keywords
+
+
+def query_entities(message: str) -> Tuple:
+    """
+    Hashable key of what a prompt asks for: intents, channel, time window and
+    search terms. Prompts that embed alike but differ here want different data.
+    """
+    hits = intent_hits(message.lower())
+    channel = channel_from_hits(hits)
+    if channel is None:
+        m = _BY_CHANNEL_RE.search(message)
+        channel = m.group(1) if m else None
+    # "7 days" / "7d" -> ("7", "d"); named windows are kept as written
+    window = tuple(sorted(
+        (m.group(1), m.group(2)[0].lower()) if m.group(1) else ("", " ".join(m.group(3).lower().split()))
+        for m in _WINDOW_RE.finditer(message)
+    ))
+    intents = frozenset(hits - _CHANNEL_TAGS.keys())
+    terms = tuple(k.lower().strip(" ?.!") for k in search_keywords(message))
+    return intents, (channel or "").lower(), window, terms
@@ -0,0 +1,49 @@
+"""
+chatbot/semantic_cache.py
+Per-session answer cache for near-duplicate chat prompts. A hit needs both a
+close embedding and the same entity key (see chatbot.intents.query_entities),
+so "Bloomberg videos today" never answers "ANI videos today".
+"""
+import time
+from typing import Hashable, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU list of (embedding, entity key, answer, stored_at) entries."""
+
+    def __init__(self, threshold: float = 0.92, size: int = 128, ttl: float = 300):
+        self.threshold = threshold
+        self.size = size
+        self.ttl = ttl
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now: float):
+        self._entries[:] = [e for e in self._entries if now - e[3] < self.ttl]
+
+    def get(self, emb, key: Hashable, now: Optional[float] = None) -> Optional[str]:
+        """Cached answer for a unit-length embedding `emb` with entity key `key`."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        candidates = [i for i, e in enumerate(self._entries) if e[1] == key]
+        if emb is None or not candidates:
+            return None
+        sims = np.stack([self._entries[i][0] for i in candidates]) @ emb
+        best = int(np.argmax(sims))
+        if sims[best] <= self.threshold:
+            return None
+        entry = self._entries.pop(candidates[best])
+        self._entries.append(entry)  # most recently used goes last
+        return entry[2]
+
+    def put(self, emb, key: Hashable, answer: str, now: Optional[float] = None):
+        """Store `answer`, evicting the least recently used entries past `size`."""
+        if emb is None:
+            return
+        now = time.monotonic() if now is None else now
+        self._entries.append((emb, key, answer, now))
+        del self._entries[:-self.size]
@@ -4,35 +4,59 @@ Uses the MONGO_URI from .env to connect to MongoDB Atlas.
 Falls back to local store when Atlas is unavailable.
 """
 import os
+import asyncio
+import hashlib
 import logging
-from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-MONGO_URI     = os.environ.get("MONGO_URI", "")
-MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "youtube_pipeline")
+# Resolved from .env on the first connection attempt (see _load_settings)
+MONGO_URI     = ""
+MONGO_DB_NAME = "youtube_pipeline"
+
+TRENDING_INDEX = "trending"
+RECENT_INDEX = "recent_keyset"
+CHANNEL_INDEX = "channel_lc_1"
 
 _client          = None
 _indexes_created = False
 _use_local       = False   # set True after first failed Atlas attempt
+_settings_loaded = False
+_videos_col      = None    # cached handle for the ingestion write path
+_async_client    = None    # motor client for event-loop writers (webhook)
+
+_CLIENT_OPTIONS = dict(
+    serverSelectionTimeoutMS=4000,
+    connectTimeoutMS=4000,
+    socketTimeoutMS=10000,
+    maxPoolSize=10,
+    # negotiated with the server in order; zlib needs no extra package
+    compressors="zstd,snappy,zlib",
+    zlibCompressionLevel=6,
+)
+
+
+def _load_settings():
+    global MONGO_URI, MONGO_DB_NAME, _settings_loaded
+    if _settings_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+    MONGO_URI     = os.environ.get("MONGO_URI", "")
+    MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "youtube_pipeline")
+    _settings_loaded = True
 
 
 def _try_mongo():
     global _client
+    _load_settings()
     if not MONGO_URI:
         return None
     try:
         from pymongo import MongoClient
-        c = MongoClient(
-            MONGO_URI,
-            serverSelectionTimeoutMS=4000,
-            connectTimeoutMS=4000,
-            socketTimeoutMS=10000,
-            maxPoolSize=10,
-        )
+        c = MongoClient(MONGO_URI, **_CLIENT_OPTIONS)
         c[MONGO_DB_NAME].command("ping")
         _client = c
         logger.info("✅ MongoDB Atlas connected")
@@ -66,12 +90,52 @@ def get_videos_collection(ensure_indexes: bool = False):
     return col
 
 
+def get_async_videos_collection():
+    """
+    Motor handle on the videos collection for code running on an event loop.
+    Returns None when Atlas is unavailable (local store) or motor is missing.
+    """
+    global _async_client
+    if get_db() is None:
+        return None
+    if _async_client is None:
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            return None
+        _async_client = AsyncIOMotorClient(MONGO_URI, **_CLIENT_OPTIONS)
+    return _async_client[MONGO_DB_NAME]["videos"]
+
+
 def _create_indexes(col):
     global _indexes_created
     try:
         col.create_index([("video_id", 1)], unique=True, background=True)
-        col.create_index([("upload_date", -1)], background=True)
-        col.create_index([("channel_id", 1)], background=True)
+        # newest-first listing + keyset pagination (video_id breaks ties);
+        # supersedes the old single-field upload_date index
+        col.create_index(
+            [("upload_date", -1), ("video_id", -1)],
+            background=True,
+            name=RECENT_INDEX
+        )
+        # channel + date covers channel filters sorted by recency; its
+        # channel_id prefix makes the old single-field index redundant
+        col.create_index(
+            [("channel_id", 1), ("upload_date", -1)],
+            background=True,
+            name="channel_date"
+        )
+        # engagement sort keys first, date range last, so trending queries
+        # walk the index in sort order and filter on upload_date in-index
+        col.create_index(
+            [("view_count", -1), ("like_count", -1), ("comment_count", -1), ("upload_date", -1)],
+            background=True,
+            name=TRENDING_INDEX
+        )
+        # "Most Liked" listings; "Most Viewed" rides the trending index prefix
+        col.create_index([("like_count", -1)], background=True)
+        # legacy data/indexes are migrated once by ingestion/migrate_db.py
+        col.create_index([("channel_lc", 1)], background=True, name=CHANNEL_INDEX)
         col.create_index(
             [("title", "text"), ("description", "text")],
             background=True,
@@ -83,42 +147,99 @@ def _create_indexes(col):
         logger.warning(f"Index creation warning: {e}")
 
 
-def build_video_doc(raw: dict) -> dict:
-    upload_date_raw = raw.get("upload_date", "")
-    if upload_date_raw and len(upload_date_raw) == 8:
+_WATCH_URL = "https://www.youtube.com/watch?v="
+
+
+def _as_int(value) -> int:
+    if type(value) is int:
+        return value
+    return int(value or 0)
+
+
+def parse_upload_date(value) -> Optional[datetime]:
+    """
+    Normalize yt-dlp (YYYYMMDD) and ISO-8601 dates to naive UTC datetimes,
+    which pymongo stores as BSON Date.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif not value:
+        return None
+    else:
+        value = str(value)
         try:
-            dt = datetime.strptime(upload_date_raw, "%Y%m%d")
-            upload_date_iso = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+            if len(value) == 8 and value.isdigit():
+                return datetime.strptime(value, "%Y%m%d")
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
         except ValueError:
-            upload_date_iso = upload_date_raw
-    else:
-        upload_date_iso = upload_date_raw
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
 
-    video_id = raw.get("video_id") or raw.get("id", "")
+def build_video_doc(raw) -> dict:
+    """
+    Build the stored document from a yt-dlp info dict, or from any object that
+    exposes the same names as attributes (webhook VideoNotification).
+    """
+    if isinstance(raw, dict):
+        g = raw.get
+    else:
+        def g(key, default=None):
+            return getattr(raw, key, default)
+    video_id = g("video_id") or g("id", "")
+    description = g("description", "")
+    if len(description) > 2000:
+        description = description[:2000]
+    channel = g("channel") or g("uploader") or ""
     doc = {
         "video_id":      video_id,
-        "title":         raw.get("title", ""),
-        "url":           raw.get("url") or f"https://www.youtube.com/watch?v={video_id}",
-        "upload_date":   upload_date_iso,
-        "view_count":    int(raw.get("view_count") or 0),
-        "like_count":    int(raw.get("like_count") or 0),
-        "description":   raw.get("description", "")[:2000],
-        "channel_id":    raw.get("channel_id", ""),
-        "channel":       raw.get("channel") or raw.get("uploader", ""),
-        "channel_url":   raw.get("channel_url") or raw.get("uploader_url", ""),
-        "duration":      raw.get("duration", 0),
-        "thumbnail":     raw.get("thumbnail", ""),
-        "tags":          raw.get("tags", []),
-        "comment_count": int(raw.get("comment_count") or 0),
+        "title":         g("title", ""),
+        "url":           g("url") or _WATCH_URL + video_id,
+        "upload_date":   parse_upload_date(g("upload_date")),
+        "view_count":    _as_int(g("view_count")),
+        "like_count":    _as_int(g("like_count")),
+        "description":   description,
+        "channel_id":    g("channel_id", ""),
+        "channel":       channel,
+        "channel_lc":    channel.lower(),
+        "channel_url":   g("channel_url") or g("uploader_url", ""),
+        "duration":      g("duration", 0),
+        "thumbnail":     g("thumbnail", ""),
+        "tags":          g("tags", []),
+        "comment_count": _as_int(g("comment_count")),
         "ingested_at":   datetime.utcnow().isoformat() + "Z",
-        "source":        raw.get("_source", "yt-dlp"),
+        "source":        g("_source", "yt-dlp"),
     }
     return doc
 
 
+def _content_hash(doc: dict) -> int:
+    """Cheap fingerprint of the fields that change between ingestion runs."""
+    key = "\x1f".join((
+        doc.get("title", ""),
+        str(doc.get("upload_date") or ""),
+        str(doc.get("view_count", 0)),
+        str(doc.get("like_count", 0)),
+        str(doc.get("comment_count", 0)),
+    ))
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _col():
+    global _videos_col
+    if _videos_col is None:
+        _videos_col = get_videos_collection(ensure_indexes=True)
+    return _videos_col
+
+
 def upsert_video(doc: dict) -> bool:
-    col = get_videos_collection()
+    col = _col()
     if hasattr(col, 'update_one'):
+        # single-document path: one round trip; batches skip unchanged
+        # documents in bulk_upsert_videos instead
+        doc["_h"] = _content_hash(doc)
         result = col.update_one(
             {"video_id": doc["video_id"]},
             {"$set": doc},
@@ -127,3 +248,66 @@ def upsert_video(doc: dict) -> bool:
         return result.upserted_id is not None
     # local store — no-op for demo
     return False
+
+
+def _by_video_id(docs: list) -> dict:
+    by_id = {}
+    for doc in docs:
+        doc["_h"] = _content_hash(doc)
+        by_id[doc["video_id"]] = doc  # last notification for a video wins
+    return by_id
+
+
+def _changed_upserts(by_id: dict, stored: dict) -> list:
+    from pymongo import UpdateOne
+    return [
+        UpdateOne({"video_id": vid}, {"$set": doc}, upsert=True)
+        for vid, doc in by_id.items()
+        if stored.get(vid) != doc["_h"]
+    ]
+
+
+_HASH_PROJECTION = {"video_id": 1, "_h": 1, "_id": 0}
+
+
+def bulk_upsert_videos(docs: list) -> Tuple[int, int]:
+    """
+    Upsert many videos in one bulk_write; returns (inserted, modified).
+    Unchanged documents (same content hash) are skipped with a single lookup
+    and counted in neither.
+    """
+    col = _col()
+    if not docs or not hasattr(col, 'bulk_write'):
+        return 0, 0  # local store — no-op for demo
+    by_id = _by_video_id(docs)
+    stored = {
+        row["video_id"]: row.get("_h")
+        for row in col.find({"video_id": {"$in": list(by_id)}}, projection=_HASH_PROJECTION)
+    }
+    ops = _changed_upserts(by_id, stored)
+    if not ops:
+        return 0, 0
+    result = col.bulk_write(ops, ordered=False)
+    return result.upserted_count, result.modified_count
+
+
+async def bulk_upsert_videos_async(docs: list) -> Tuple[int, int]:
+    """
+    Event-loop variant of bulk_upsert_videos on the motor driver; falls back
+    to the blocking path in a worker thread when motor is not available.
+    """
+    col = get_async_videos_collection()
+    if col is None:
+        return await asyncio.to_thread(bulk_upsert_videos, docs)
+    if not docs:
+        return 0, 0
+    by_id = _by_video_id(docs)
+    stored = {
+        row["video_id"]: row.get("_h")
+        async for row in col.find({"video_id": {"$in": list(by_id)}}, projection=_HASH_PROJECTION)
+    }
+    ops = _changed_upserts(by_id, stored)
+    if not ops:
+        return 0, 0
+    result = await col.bulk_write(ops, ordered=False)
+    return result.upserted_count, result.modified_count
@@ -10,10 +10,11 @@ import os
 import time
 import argparse
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import yt_dlp
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
-from db import build_video_doc, upsert_video
+from db import build_video_doc, bulk_upsert_videos
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 log = logging.getLogger(__name__)
@@ -24,23 +25,40 @@ TARGET_CHANNELS = [
     # Add more high-frequency channels as needed
 ]
 DEFAULT_LIMIT = 1000
+DEFAULT_WORKERS = 4  # concurrent metadata fetches; keep low to avoid YouTube throttling
+UPSERT_BATCH = 100   # docs per bulk_write (one hash lookup + one write per batch)
+# Per-worker pause after each metadata fetch, longer every 10th video; keeps
+# the sequential loop's pacing for each of the DEFAULT_WORKERS threads
+FETCH_DELAY_SECONDS = 0.5
+BURST_PAUSE_SECONDS = 2
 
 
-def fetch_video_ids(channel_url: str, limit: int) -> list:
+def iter_video_ids(channel_url: str, limit: int):
+    """Yield video IDs as yt-dlp pages through the channel, without materializing the playlist."""
     log.info(f"Fetching up to {limit} video IDs from: {channel_url}")
     ydl_opts = {
         "quiet": True,
         "extract_flat": True,
+        "lazy_playlist": True,
         "playlistend": limit,
         "ignoreerrors": True,
     }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(f"{channel_url}/videos", download=False)
         if not info or "entries" not in info:
-            return []
-        entries = [e for e in info["entries"] if e and e.get("id")]
-        log.info(f"Found {len(entries)} video IDs")
-        return [e["id"] for e in entries]
+            return
+        found = 0
+        for e in info["entries"]:
+            if e and e.get("id"):
+                found += 1
+                yield e["id"]
+                if found >= limit:
+                    break
+        log.info(f"Found {found} video IDs")
+
+
+def fetch_video_ids(channel_url: str, limit: int) -> list:
+    return list(iter_video_ids(channel_url, limit))
 
 
 def fetch_full_metadata(video_id: str) -> dict | None:
@@ -54,34 +72,68 @@ def fetch_full_metadata(video_id: str) -> dict | None:
         return None
 
 
-def ingest_channel(channel_url: str, limit: int = DEFAULT_LIMIT):
+def _throttled_fetch(video_id: str, n: int) -> dict | None:
+    try:
+        return fetch_full_metadata(video_id)
+    finally:
+        time.sleep(BURST_PAUSE_SECONDS if n % 10 == 0 else FETCH_DELAY_SECONDS)
+
+
+def ingest_channel(channel_url: str, limit: int = DEFAULT_LIMIT, workers: int = DEFAULT_WORKERS):
+    """
+    Producer/consumer pipeline: IDs are streamed from the channel listing and
+    submitted for metadata fetch as they arrive; finished fetches are upserted
+    while the listing is still being paged, in batches of UPSERT_BATCH.
+    """
     log.info(f"=== Starting ingestion for: {channel_url} ===")
-    video_ids = fetch_video_ids(channel_url, limit)
-    if not video_ids:
-        log.error("No videos found. Skipping.")
-        return 0, 0, 0
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0, "done": 0}
+    batch = []
 
-    inserted = updated = failed = 0
-    for i, vid_id in enumerate(video_ids, 1):
-        log.info(f"[{i}/{len(video_ids)}] Processing: {vid_id}")
-        raw = fetch_full_metadata(vid_id)
-        if not raw:
-            failed += 1
-            continue
-        raw["_source"] = "yt-dlp"
-        doc = build_video_doc(raw)
+    def flush():
+        if not batch:
+            return
         try:
-            is_new = upsert_video(doc)
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
+            inserted, modified = bulk_upsert_videos(batch)
+            counts["inserted"] += inserted
+            counts["updated"] += modified
+            counts["unchanged"] += len(batch) - inserted - modified
         except Exception as e:
-            log.error(f"DB error for {vid_id}: {e}")
-            failed += 1
-        time.sleep(2) if i % 10 == 0 else time.sleep(0.5)
+            log.error(f"DB error for batch of {len(batch)}: {e}")
+            counts["failed"] += len(batch)
+        batch.clear()
+
+    def store(future, vid_id):
+        counts["done"] += 1
+        log.info(f"[{counts['done']}] Processing: {vid_id}")
+        raw = future.result()
+        if not raw:
+            counts["failed"] += 1
+            return
+        raw["_source"] = "yt-dlp"
+        batch.append(build_video_doc(raw))
+        if len(batch) >= UPSERT_BATCH:
+            flush()
+
+    submitted = 0
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = {}
+        for vid_id in iter_video_ids(channel_url, limit):
+            submitted += 1
+            pending[ex.submit(_throttled_fetch, vid_id, submitted)] = vid_id
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(future, pending.pop(future))
+        for future in as_completed(pending):
+            store(future, pending[future])
+    flush()
+
+    if not submitted:
+        log.error("No videos found. Skipping.")
+        return 0, 0, 0
 
-    log.info(f"=== Done | Inserted: {inserted} | Updated: {updated} | Failed: {failed} ===")
+    inserted, updated, failed = counts["inserted"], counts["updated"], counts["failed"]
+    log.info(f"=== Done | Inserted: {inserted} | Updated: {updated} | Unchanged: {counts['unchanged']} | Failed: {failed} ===")
     return inserted, updated, failed
 
 
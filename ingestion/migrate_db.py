@@ -0,0 +1,51 @@
+"""
+ingestion/migrate_db.py
+Run this once against an existing database to migrate legacy documents and
+drop indexes superseded by the ones db.py creates.
+Usage: python ingestion/migrate_db.py
+"""
+import sys
+import os
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from db import get_videos_collection
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+log = logging.getLogger(__name__)
+
+# Covered by the compound recent_keyset / channel_date indexes
+REDUNDANT_INDEXES = ("channel_id_1", "upload_date_-1")
+
+
+def main():
+    col = get_videos_collection(ensure_indexes=True)
+    if not hasattr(col, "update_many"):
+        log.info("Local store in use, nothing to migrate")
+        return
+
+    # Legacy ISO-string dates to BSON Date; unparseable values are kept as-is
+    res = col.update_many(
+        {"upload_date": {"$type": "string"}},
+        [{"$set": {"upload_date": {"$convert": {
+            "input": "$upload_date", "to": "date", "onError": "$upload_date", "onNull": None
+        }}}}]
+    )
+    log.info(f"upload_date converted on {res.modified_count} documents")
+
+    # Normalized channel name used by prefix lookups
+    res = col.update_many(
+        {"channel_lc": {"$exists": False}},
+        [{"$set": {"channel_lc": {"$toLower": "$channel"}}}]
+    )
+    log.info(f"channel_lc backfilled on {res.modified_count} documents")
+
+    existing = col.index_information()
+    for name in REDUNDANT_INDEXES:
+        if name in existing:
+            col.drop_index(name)
+            log.info(f"Dropped redundant index {name}")
+
+
+if __name__ == "__main__":
+    main()
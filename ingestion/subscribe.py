@@ -7,8 +7,9 @@ Usage: python ingestion/subscribe.py
 import sys
 import os
 import argparse
+import asyncio
 import logging
-import requests
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +22,14 @@ PUBSUB_HUB_URL = os.environ.get("PUBSUB_HUB_URL", "https://pubsubhubbub.appspot.
 WEBHOOK_BASE_URL = os.environ.get("WEBHOOK_BASE_URL", "http://localhost:8080")
 WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
 LEASE_SECONDS = 864000
+CALLBACK_URL = f"{WEBHOOK_BASE_URL}/webhook"
+MAX_CONCURRENT_REQUESTS = 100  # hub requests in flight during a (re)subscribe run
+
+# Hub (un)subscribe POSTs are idempotent, so transient 5xx are retried with
+# exponential backoff (0.5s, 1s, 2s)
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.5
 
 TARGET_CHANNEL_IDS = [
     id_.strip()
@@ -29,31 +38,66 @@ TARGET_CHANNEL_IDS = [
 ]
 
 
-def subscribe_channel(channel_id: str, mode: str = "subscribe") -> bool:
-    topic_url = f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
-    callback_url = f"{WEBHOOK_BASE_URL}/webhook"
-    payload = {
-        "hub.callback": callback_url,
+# Static hub fields per mode; only hub.topic varies between channels
+_PAYLOAD_BASE = {
+    mode: {
+        "hub.callback": CALLBACK_URL,
         "hub.mode": mode,
-        "hub.topic": topic_url,
         "hub.verify": "async",
         "hub.secret": WEBHOOK_SECRET,
         "hub.lease_seconds": LEASE_SECONDS,
     }
-    log.info(f"[{mode.upper()}] Channel: {channel_id} → Callback: {callback_url}")
+    for mode in ("subscribe", "unsubscribe")
+}
+_TOPIC_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id="
+
+
+def _payload(channel_id: str, mode: str) -> dict:
+    return {**_PAYLOAD_BASE[mode], "hub.topic": _TOPIC_URL + channel_id}
+
+
+def _report(channel_id: str, mode: str, status_code: int, text: str) -> bool:
+    if status_code in (202, 204):
+        log.info(f"✓ Success: {mode} request sent for channel {channel_id}")
+        return True
+    log.error(f"✗ Failed: {status_code} - {text}")
+    return False
+
+
+async def _subscribe_channel_async(client: httpx.AsyncClient, channel_id: str, mode: str) -> bool:
+    log.info(f"[{mode.upper()}] Channel: {channel_id} → Callback: {CALLBACK_URL}")
     try:
-        resp = requests.post(PUBSUB_HUB_URL, data=payload, timeout=30)
-        if resp.status_code in (202, 204):
-            log.info(f"✓ Success: {mode} request sent for channel {channel_id}")
-            return True
-        else:
-            log.error(f"✗ Failed: {resp.status_code} - {resp.text}")
-            return False
+        data = _payload(channel_id, mode)
+        resp = await client.post(PUBSUB_HUB_URL, data=data)
+        for attempt in range(MAX_RETRIES):
+            if resp.status_code not in RETRY_STATUSES:
+                break
+            await asyncio.sleep(BACKOFF_SECONDS * 2 ** attempt)
+            resp = await client.post(PUBSUB_HUB_URL, data=data)
+        return _report(channel_id, mode, resp.status_code, resp.text)
     except Exception as e:
         log.error(f"✗ Error sending {mode} request for {channel_id}: {e}")
         return False
 
 
+async def subscribe_all(channel_ids: list, mode: str = "subscribe",
+                        max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> int:
+    """
+    Send the hub requests concurrently from one event loop over one shared
+    client; its connection pool caps requests in flight at `max_concurrency`.
+    Returns the success count.
+    """
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    # no pool timeout: with thousands of channels most requests queue for a connection
+    timeout = httpx.Timeout(30, pool=None)
+    transport = httpx.AsyncHTTPTransport(retries=3, limits=limits)  # retries connection failures
+    async with httpx.AsyncClient(timeout=timeout, transport=transport) as client:
+        results = await asyncio.gather(
+            *(_subscribe_channel_async(client, channel_id, mode) for channel_id in channel_ids)
+        )
+    return sum(results)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", choices=["subscribe", "unsubscribe"], default="subscribe")
@@ -68,10 +112,7 @@ def main():
     else:
         log.info(f"Unsubscribing from {len(TARGET_CHANNEL_IDS)} channels...")
     
-    successes = 0
-    for channel_id in TARGET_CHANNEL_IDS:
-        if subscribe_channel(channel_id, args.mode):
-            successes += 1
+    successes = asyncio.run(subscribe_all(TARGET_CHANNEL_IDS, args.mode))
     
     log.info(f"Completed: {successes}/{len(TARGET_CHANNEL_IDS)} channels {'subscribed' if args.mode == 'subscribe' else 'unsubscribed'}")
 
@@ -19,19 +19,45 @@ Usage:
 import os
 import sys
 import argparse
-from datetime import datetime
 import logging
-import subprocess
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Heavy subsystems (uvicorn, yt-dlp, FastAPI apps, dotenv) are imported inside
+# the command handlers so that e.g. `query --stats` only pays for what it uses.
 logger = logging.getLogger(__name__)
 
-from dotenv import load_dotenv
-load_dotenv()
+
+def _worker_count():
+    """Number of uvicorn worker processes per server (WEB_CONCURRENCY overrides)"""
+    workers = os.environ.get("WEB_CONCURRENCY")
+    if workers:
+        return max(1, int(workers))
+    return max(2, (os.cpu_count() or 1) // 2)
+
+
+def _configure_process():
+    """Logging and .env for the current process (the CLI and each server child)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def _child_main(target):
+    """
+    Process entry point for run_all_services. Spawned children (Windows,
+    macOS) import this module without running `__main__`, so they would
+    otherwise start with no log handlers and no .env values.
+    """
+    _configure_process()
+    target()
+
+
+# C event loop (libuv) and HTTP parser for the webhook hot path; uvloop has
+# no Windows build, so that platform keeps the stdlib asyncio loop
+_WEBHOOK_LOOP = "asyncio" if sys.platform == "win32" else "uvloop"
 
 
 def run_webhook_server():
@@ -41,18 +67,21 @@ def run_webhook_server():
     logger.info("="*80)
     logger.info("Webhook server will listen for PubSubHubbub notifications from YouTube")
     
-    from webhook.webhook_app import app
     import uvicorn
     
     port = int(os.environ.get("PORT", 8080))
     host = os.environ.get("HOST", "0.0.0.0")
+    workers = _worker_count()
     
-    logger.info(f"Webhook server starting on {host}:{port}")
+    logger.info(f"Webhook server starting on {host}:{port} ({workers} workers)")
     logger.info(f"Webhook endpoint: POST {os.environ.get('WEBHOOK_BASE_URL', 'http://localhost:8080')}/webhook")
     logger.info("Waiting for YouTube notifications...")
     
     try:
-        uvicorn.run(app, host=host, port=port, log_level="info")
+        uvicorn.run(
+            "webhook.webhook_app:app", host=host, port=port, workers=workers, log_level="info",
+            loop=_WEBHOOK_LOOP, http="httptools", access_log=False,
+        )
     except KeyboardInterrupt:
         logger.info("Webhook server stopped")
 
@@ -63,18 +92,18 @@ def run_api_server():
     logger.info("STARTING REST API SERVER")
     logger.info("="*80)
     
-    from api.api import app
     import uvicorn
     
     port = int(os.environ.get("API_PORT", 8000))
     host = os.environ.get("HOST", "0.0.0.0")
+    workers = _worker_count()
     
-    logger.info(f"API server starting on {host}:{port}")
+    logger.info(f"API server starting on {host}:{port} ({workers} workers)")
     logger.info(f"API documentation: http://{host}:{port}/docs")
     logger.info(f"API root: http://{host}:{port}/")
     
     try:
-        uvicorn.run(app, host=host, port=port, log_level="info")
+        uvicorn.run("api.api:app", host=host, port=port, workers=workers, log_level="info")
     except KeyboardInterrupt:
         logger.info("API server stopped")
 
@@ -136,6 +165,8 @@ def run_chatbot():
     logger.info("Opening chatbot UI in browser...")
     logger.info("Chatbot will be available at: http://localhost:8501")
     
+    import subprocess
+    
     try:
         subprocess.run(
             ["streamlit", "run", "streamlit_app.py"],
@@ -184,25 +215,30 @@ def run_all_services():
     logger.info("="*80)
     logger.info("STARTING ALL SERVICES (Webhook + API)")
     logger.info("="*80)
-    logger.info("Running both servers in parallel...")
+    logger.info("Running both servers in separate processes...")
     logger.info("")
     logger.info("Webhook server: http://0.0.0.0:8080")
     logger.info("API server: http://0.0.0.0:8000/docs")
     logger.info("")
     
-    import threading
+    from multiprocessing import Process
     
-    webhook_thread = threading.Thread(target=run_webhook_server, daemon=True)
-    api_thread = threading.Thread(target=run_api_server, daemon=True)
+    # Not daemonic: each server spawns its own uvicorn worker processes
+    webhook_proc = Process(target=_child_main, args=(run_webhook_server,), name="webhook")
+    api_proc = Process(target=_child_main, args=(run_api_server,), name="api")
     
-    webhook_thread.start()
-    api_thread.start()
+    webhook_proc.start()
+    api_proc.start()
     
     try:
-        webhook_thread.join()
-        api_thread.join()
+        webhook_proc.join()
+        api_proc.join()
     except KeyboardInterrupt:
         logger.info("Shutting down all services...")
+        for proc in (webhook_proc, api_proc):
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
         sys.exit(0)
 
 
@@ -256,6 +292,7 @@ Examples:
     
     args = parser.parse_args()
     
+    from datetime import datetime
     logger.info(f"YouTube Pipeline - Started at {datetime.now().isoformat()}")
     
     if not args.command:
@@ -290,4 +327,5 @@ Examples:
 
 
 if __name__ == "__main__":
+    _configure_process()
     main()
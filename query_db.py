@@ -3,9 +3,160 @@ query_db.py
 Utility functions for querying the video database with various filters and aggregations
 """
 import os
-from typing import List, Dict, Optional
+import re
+import json
+import time
+import base64
+import functools
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from db import get_videos_collection
+from db import get_videos_collection, parse_upload_date, TRENDING_INDEX, CHANNEL_INDEX, RECENT_INDEX
+
+# Global aggregates change slowly, so repeat calls are served from memory.
+# The cache is per process: writers (webhook, ingestion CLI) cannot invalidate
+# it in the API or dashboard, so readers may lag new writes by up to the TTL.
+CACHE_TTL_SECONDS = int(os.environ.get("QUERY_CACHE_TTL", 300))
+_cached_queries = []
+
+
+def _freeze(value):
+    """Make list arguments (e.g. `fields`) usable in a cache key"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _fresh_copy(value):
+    """Copy a cached result (container plus its dict rows) so callers can mutate it"""
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return {k: _fresh_copy(v) if isinstance(v, (list, dict)) else v for k, v in value.items()}
+    return value
+
+
+def _ttl_cache(maxsize: int = 32):
+    """Memoize a query function per argument tuple for CACHE_TTL_SECONDS"""
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (_freeze(args), _freeze(sorted(kwargs.items())))
+            now = time.monotonic()
+            hit = cache.get(key)
+            if hit is not None and hit[0] > now:
+                return _fresh_copy(hit[1])
+            value = func(*args, **kwargs)
+            if len(cache) >= maxsize:
+                cache.pop(next(iter(cache)), None)  # evict oldest entry
+            cache[key] = (now + CACHE_TTL_SECONDS, value)
+            return _fresh_copy(value)
+
+        wrapper.cache_clear = cache.clear
+        _cached_queries.append(wrapper)
+        return wrapper
+    return decorator
+
+
+def clear_query_cache():
+    """Drop all cached query results (call after writing to the collection)"""
+    for func in _cached_queries:
+        func.cache_clear()
+
+
+def channel_filter(channel: str) -> Dict:
+    """
+    Case-insensitive channel-name prefix filter.
+    Matches against the lowercased `channel_lc` field with an anchored,
+    flag-free regex so MongoDB can answer it with an index range scan.
+    """
+    return {"channel_lc": {"$regex": "^" + re.escape(channel.strip().lower())}}
+
+
+# Newest-first ordering with video_id as a unique tie-breaker, so the last row
+# of a page is an exact resume point (backed by the upload_date/video_id index)
+_RECENT_SORT = [("upload_date", -1), ("video_id", -1)]
+
+
+def _sort_spec(sort_by: str = "upload_date") -> List[Tuple[str, int]]:
+    """Descending sort on `sort_by` with the same video_id tie-breaker"""
+    if sort_by == "upload_date":
+        return _RECENT_SORT
+    return [(sort_by, -1), ("video_id", -1)]
+
+# Upper bound for cursor batch sizes; pages are fetched in a single batch
+# instead of pymongo's default 101-document first batch
+_MAX_BATCH = 500
+
+
+# Fields returned by the listing helpers; bulky/internal ones (tags,
+# channel_url, ingested_at, hashes, _id) stay on the server
+_DEFAULT_FIELDS = [
+    "video_id", "title", "url", "channel", "channel_id", "upload_date",
+    "view_count", "like_count", "comment_count", "duration", "description",
+]
+
+
+def _projection(fields: Optional[List[str]] = None) -> Dict:
+    """
+    Server-side projection for find(); `fields` overrides the default set.
+    The keyset sort keys are always kept so next_cursor() works on any page.
+    """
+    projection = {"_id": 0, "video_id": 1, "upload_date": 1}
+    for field in fields or _DEFAULT_FIELDS:
+        projection[field] = 1
+    return projection
+
+
+def _after_filter(after: Tuple[str, str]) -> Dict:
+    """Range predicate selecting rows that sort strictly after the `after` cursor"""
+    after_date, after_id = after
+    return {"$or": [
+        {"upload_date": {"$lt": after_date}},
+        {"upload_date": after_date, "video_id": {"$lt": after_id}},
+    ]}
+
+
+def _check_after(after, sort_by: str):
+    """Keyset cursors (`after`) only line up with the default upload_date order"""
+    if after and sort_by != "upload_date":
+        raise ValueError(f"'after' cursors require sort_by='upload_date', got {sort_by!r}")
+
+
+def next_cursor(results: List[Dict]) -> Optional[Tuple[str, str]]:
+    """
+    Cursor for the page following `results`, to be passed back as `after`.
+    Returns None when the page is empty.
+    """
+    if not results:
+        return None
+    last = results[-1]
+    return last.get("upload_date"), last.get("video_id")
+
+
+def encode_cursor(cursor: Optional[Tuple]) -> Optional[str]:
+    """Opaque URL-safe token for a next_cursor() value (for API clients)"""
+    if not cursor:
+        return None
+    upload_date, video_id = cursor
+    if isinstance(upload_date, datetime):
+        upload_date = upload_date.isoformat()
+    raw = json.dumps([upload_date, video_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor(); raises ValueError on a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        upload_date, video_id = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+    upload_date = parse_upload_date(upload_date)
+    if upload_date is None or not isinstance(video_id, str):
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return upload_date, video_id
 
 
 def search_videos(text_query: str = None, 
@@ -15,10 +166,14 @@ def search_videos(text_query: str = None,
                  date_from: str = None,
                  date_to: str = None,
                  limit: int = 50,
-                 offset: int = 0) -> List[Dict]:
+                 after: Optional[Tuple[str, str]] = None,
+                 fields: Optional[List[str]] = None,
+                 sort_by: str = "upload_date") -> List[Dict]:
     """
-    Advanced search function for videos with multiple filter options
+    Advanced search function for videos with multiple filter options.
+    Pages newest-first; pass `next_cursor(previous_page)` as `after` for the next page.
     """
+    _check_after(after, sort_by)
     collection = get_videos_collection()
     
     query_filter = {}
@@ -29,7 +184,7 @@ def search_videos(text_query: str = None,
     
     # Channel filter
     if channel:
-        query_filter["channel"] = {"$regex": channel, "$options": "i"}
+        query_filter.update(channel_filter(channel))
     
     # View count filters
     if min_views is not None or max_views is not None:
@@ -45,200 +200,207 @@ def search_videos(text_query: str = None,
     if date_from or date_to:
         date_filter = {}
         if date_from:
-            date_filter["$gte"] = date_from
+            date_filter["$gte"] = parse_upload_date(date_from)
         if date_to:
-            date_filter["$lte"] = date_to
+            date_filter["$lte"] = parse_upload_date(date_to)
         if date_filter:
             query_filter["upload_date"] = date_filter
     
+    # Keyset pagination: resume after the last row instead of skipping
+    if after:
+        query_filter.update(_after_filter(after))
+    
+    # With $text the other predicates share its filter and are applied by the
+    # text plan before any document is fetched, so find() needs no pipeline
     # Execute query with sorting and pagination
-    cursor = collection.find(query_filter).sort("upload_date", -1).skip(offset).limit(limit)
+    cursor = collection.find(query_filter, _projection(fields)).sort(_sort_spec(sort_by)).limit(limit).batch_size(min(limit, _MAX_BATCH))
     results = list(cursor)
     
-    # Clean up results
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
-def get_videos_by_channel(channel: str, limit: int = 50) -> List[Dict]:
+def get_videos_by_channel(channel: str, limit: int = 50,
+                          after: Optional[Tuple[str, str]] = None,
+                          fields: Optional[List[str]] = None,
+                          sort_by: str = "upload_date") -> List[Dict]:
     """
     Get videos from a specific channel
     """
+    _check_after(after, sort_by)
     collection = get_videos_collection()
     
-    query_filter = {"channel": {"$regex": channel, "$options": "i"}}
+    query_filter = channel_filter(channel)
+    if after:
+        query_filter.update(_after_filter(after))
     
-    cursor = collection.find(query_filter).sort("upload_date", -1).limit(limit)
+    cursor = collection.find(query_filter, _projection(fields)).sort(_sort_spec(sort_by)).limit(limit).batch_size(min(limit, _MAX_BATCH))
     results = list(cursor)
     
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
-def get_top_videos(sort_by: str = "view_count", limit: int = 20) -> List[Dict]:
+@_ttl_cache()
+def get_top_videos(sort_by: str = "view_count", limit: int = 20,
+                   fields: Optional[List[str]] = None) -> List[Dict]:
     """
     Get top videos based on specified metric
     """
     collection = get_videos_collection()
     
     sort_direction = -1  # Descending order
-    cursor = collection.find({}).sort(sort_by, sort_direction).limit(limit)
+    cursor = collection.find({}, _projection(fields)).sort(sort_by, sort_direction).limit(limit).batch_size(min(limit, _MAX_BATCH))
     results = list(cursor)
     
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
+# Grouping key for per-channel aggregates; videos stored without a channel
+# name ("" or missing) are counted under their channel_id
+_CHANNEL_KEY = {"$cond": [{"$gt": ["$channel", ""]}, "$channel", "$channel_id"]}
+
+# Per-channel engagement breakdown used by get_video_statistics
+_CHANNEL_STATS_PIPELINE = [
+    {
+        "$group": {
+            "_id": _CHANNEL_KEY,
+            "video_count": {"$sum": 1},
+            "total_views": {"$sum": "$view_count"},
+            "avg_views": {"$avg": "$view_count"},
+            "total_likes": {"$sum": "$like_count"},
+            "avg_likes": {"$avg": "$like_count"},
+            "total_duration": {"$sum": "$duration"},
+            "earliest_video": {"$min": "$upload_date"},
+            "latest_video": {"$max": "$upload_date"}
+        }
+    },
+    {
+        "$project": {
+            "channel": "$_id",
+            "video_count": 1,
+            "total_views": 1,
+            "avg_views": {"$round": ["$avg_views", 2]},
+            "total_likes": 1,
+            "avg_likes": {"$round": ["$avg_likes", 2]},
+            "total_duration": 1,
+            "earliest_video": 1,
+            "latest_video": 1,
+            "_id": 0
+        }
+    },
+    {
+        "$sort": {"avg_views": -1}
+    }
+]
+
+
+@_ttl_cache()
 def get_video_statistics() -> Dict:
     """
-    Get comprehensive statistics about the video database
+    Get comprehensive statistics about the video database.
+    Count and per-channel stats come from one $facet pass; the platform
+    totals are reduced from the per-channel rows in Python.
     """
     collection = get_videos_collection()
     
-    total_videos = collection.count_documents({})
-    total_channels = len(collection.distinct("channel"))
-    
-    # Get stats for each channel
-    channel_stats = list(collection.aggregate([
+    facets = next(collection.aggregate([
         {
-            "$group": {
-                "_id": "$channel",
-                "video_count": {"$sum": 1},
-                "total_views": {"$sum": "$view_count"},
-                "avg_views": {"$avg": "$view_count"},
-                "total_likes": {"$sum": "$like_count"},
-                "avg_likes": {"$avg": "$like_count"},
-                "latest_video": {"$max": "$upload_date"}
+            "$facet": {
+                "total": [{"$count": "n"}],
+                "by_channel": _CHANNEL_STATS_PIPELINE
             }
-        },
-        {
-            "$project": {
-                "channel": "$_id",
-                "video_count": 1,
-                "total_views": 1,
-                "avg_views": {"$round": ["$avg_views", 2]},
-                "total_likes": 1,
-                "avg_likes": {"$round": ["$avg_likes", 2]},
-                "latest_video": 1,
-                "_id": 0
-            }
-        },
-        {
-            "$sort": {"avg_views": -1}
         }
-    ]))
-    
-    # Get overall platform stats
-    platform_stats = list(collection.aggregate([
-        {
-            "$group": {
-                "_id": None,
-                "total_views": {"$sum": "$view_count"},
-                "total_likes": {"$sum": "$like_count"},
-                "avg_duration": {"$avg": "$duration"},
-                "earliest_video": {"$min": "$upload_date"},
-                "latest_video": {"$max": "$upload_date"}
-            }
-        },
-        {
-            "$project": {
-                "total_views": 1,
-                "total_likes": 1,
-                "avg_duration": {"$round": ["$avg_duration", 2]},
-                "earliest_video": 1,
-                "latest_video": 1,
-                "_id": 0
-            }
+    ]), {})
+    
+    total_videos = (facets.get("total") or [{"n": 0}])[0]["n"]
+    channel_stats = facets.get("by_channel", [])
+    
+    overall_stats = {}
+    if channel_stats:
+        earliest = [c["earliest_video"] for c in channel_stats if c.get("earliest_video")]
+        latest = [c["latest_video"] for c in channel_stats if c.get("latest_video")]
+        total_duration = sum(c.get("total_duration") or 0 for c in channel_stats)
+        overall_stats = {
+            "total_views": sum(c.get("total_views") or 0 for c in channel_stats),
+            "total_likes": sum(c.get("total_likes") or 0 for c in channel_stats),
+            "avg_duration": round(total_duration / total_videos, 2) if total_videos else 0,
+            "earliest_video": min(earliest) if earliest else None,
+            "latest_video": max(latest) if latest else None
         }
-    ]))
-    
-    overall_stats = platform_stats[0] if platform_stats else {}
     
     return {
         "database": {
             "total_videos": total_videos,
-            "total_channels": total_channels
+            "total_channels": len(channel_stats)
         },
         "channels": channel_stats,
         "overall": overall_stats
     }
 
 
-def get_trending_videos(days: int = 7, limit: int = 20) -> List[Dict]:
+@_ttl_cache()
+def get_trending_videos(days: int = 7, limit: int = 20,
+                        fields: Optional[List[str]] = None) -> List[Dict]:
     """
     Get trending videos based on recent activity (views, likes, comments)
     """
-    collection = get_videos_collection()
+    # The hinted index must exist before the query is planned
+    collection = get_videos_collection(ensure_indexes=True)
     
     # Calculate cutoff date
     cutoff_date = datetime.utcnow() - timedelta(days=days)
-    cutoff_iso = cutoff_date.isoformat()
     
     # Query for recent videos with high engagement
     query_filter = {
-        "upload_date": {"$gte": cutoff_iso}
+        "upload_date": {"$gte": cutoff_date}
     }
     
-    # Sort by a combination of views, likes, and comments
-    cursor = collection.find(query_filter).sort([
+    # Sort by a combination of views, likes, and comments. The "trending"
+    # index yields rows in this order, so no in-memory SORT stage is needed;
+    # allow_disk_use=False makes a missing index fail fast instead of spilling.
+    cursor = collection.find(
+        query_filter, _projection(fields), allow_disk_use=False
+    ).sort([
         ("view_count", -1),
         ("like_count", -1),
         ("comment_count", -1)
-    ]).limit(limit)
+    ]).hint(TRENDING_INDEX).limit(limit).batch_size(min(limit, _MAX_BATCH))
     
     results = list(cursor)
     
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
-def get_videos_by_date_range(date_from, date_to, limit: int = 50, channel: str = None) -> List[Dict]:
+def get_videos_by_date_range(date_from, date_to, limit: int = 50, channel: str = None,
+                             after: Optional[Tuple[str, str]] = None,
+                             fields: Optional[List[str]] = None) -> List[Dict]:
     """
     Get videos within a specific date range
     date_from and date_to can be datetime objects or ISO format strings
     """
     collection = get_videos_collection()
     
-    # Convert datetime objects to ISO format strings if needed
-    if isinstance(date_from, datetime):
-        date_from = date_from.isoformat()
-    if isinstance(date_to, datetime):
-        date_to = date_to.isoformat()
-    
+    # upload_date is a BSON Date; compare against native datetimes
     query_filter = {
         "upload_date": {
-            "$gte": date_from,
-            "$lte": date_to
+            "$gte": parse_upload_date(date_from),
+            "$lte": parse_upload_date(date_to)
         }
     }
     
     # Add channel filter if specified
     if channel:
-        query_filter["channel"] = {"$regex": channel, "$options": "i"}
+        query_filter.update(channel_filter(channel))
+    if after:
+        query_filter.update(_after_filter(after))
     
-    cursor = collection.find(query_filter).sort("upload_date", -1).limit(limit)
+    cursor = collection.find(query_filter, _projection(fields)).sort(_RECENT_SORT).limit(limit).batch_size(min(limit, _MAX_BATCH))
     results = list(cursor)
     
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
-def get_most_recent_entries(limit: int = 10) -> List[Dict]:
+def get_most_recent_entries(limit: int = 10, after: Optional[Tuple[str, str]] = None,
+                            fields: Optional[List[str]] = None) -> List[Dict]:
     """
     Return the most recent entries added to the collection
     This function is specifically for the assessment to test webhook and ingestion
@@ -246,57 +408,86 @@ def get_most_recent_entries(limit: int = 10) -> List[Dict]:
     collection = get_videos_collection()
     
     # Query for most recent entries based on upload_date
-    cursor = collection.find({}).sort("upload_date", -1).limit(limit)
+    query_filter = _after_filter(after) if after else {}
+    cursor = collection.find(query_filter, _projection(fields)).sort(_RECENT_SORT).limit(limit).batch_size(min(limit, _MAX_BATCH))
     results = list(cursor)
     
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
     return results
 
 
-def get_recent_videos(limit: int = 10, channel: str = None) -> List[Dict]:
-    """Get recently published videos, optionally filtered by channel"""
+def iter_recent_videos(limit: int = 10, channel: str = None,
+                       after: Optional[Tuple[str, str]] = None,
+                       fields: Optional[List[str]] = None,
+                       sort_by: str = "upload_date") -> Iterator[Dict]:
+    """
+    Stream recently published videos one document at a time straight from
+    the cursor, so callers can start emitting before the page is complete.
+    The collection and cursor are set up on call, not on first iteration.
+    """
+    _check_after(after, sort_by)
     collection = get_videos_collection()
     
     query_filter = {}
     if channel:
-        query_filter["channel"] = {"$regex": channel, "$options": "i"}
+        query_filter.update(channel_filter(channel))
+    if after:
+        query_filter.update(_after_filter(after))
     
-    cursor = collection.find(query_filter).sort("upload_date", -1).limit(limit)
-    results = list(cursor)
-    
-    for result in results:
-        if "_id" in result:
-            del result["_id"]
-    
-    return results
+    cursor = collection.find(query_filter, _projection(fields)).sort(_sort_spec(sort_by)).limit(limit).batch_size(min(limit, _MAX_BATCH))
+    return iter(cursor)
+
+
+def get_recent_videos(limit: int = 10, channel: str = None,
+                      after: Optional[Tuple[str, str]] = None,
+                      fields: Optional[List[str]] = None,
+                      sort_by: str = "upload_date") -> List[Dict]:
+    """Get recently published videos, optionally filtered by channel"""
+    return list(iter_recent_videos(limit, channel, after, fields, sort_by))
 
 
 def count_videos_by_channel(channel: str) -> int:
     """Count total videos from a specific channel"""
-    collection = get_videos_collection()
+    # The hinted index must exist before the count is planned
+    collection = get_videos_collection(ensure_indexes=True)
     
-    query_filter = {"channel": {"$regex": channel, "$options": "i"}}
-    return collection.count_documents(query_filter)
+    query_filter = channel_filter(channel)
+    return collection.count_documents(query_filter, hint=CHANNEL_INDEX)
 
 
+@_ttl_cache()
 def get_channel_stats() -> Dict:
     """Get statistics for each channel"""
     collection = get_videos_collection()
     
-    stats = {}
-    channels = collection.distinct("channel")
-    
-    for channel in channels:
-        count = collection.count_documents({"channel": channel})
-        stats[channel] = count
-    
-    return stats
+    # One grouped pass instead of a count_documents round trip per channel
+    pipeline = [
+        {"$group": {
+            "_id": _CHANNEL_KEY,
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    return {
+        row["_id"]: row["count"]
+        for row in collection.aggregate(pipeline, allowDiskUse=False)
+    }
 
 
-def get_videos_last_24h(channel: str = None) -> List[Dict]:
+def get_videos_last_24h(channel: str = None,
+                        fields: Optional[List[str]] = None) -> List[Dict]:
     """Get videos published in the last 24 hours"""
     start_time = datetime.utcnow() - timedelta(hours=24)
-    return get_videos_by_date_range(start_time, datetime.utcnow(), limit=50, channel=channel)
+    return get_videos_by_date_range(start_time, datetime.utcnow(), limit=50, channel=channel,
+                                    fields=fields)
+
+
+def count_videos_last_24h(channel: str = None) -> int:
+    """Count videos published in the last 24 hours without fetching them"""
+    collection = get_videos_collection(ensure_indexes=True)
+    
+    now = datetime.utcnow()
+    query_filter = {"upload_date": {"$gte": now - timedelta(hours=24), "$lte": now}}
+    if channel:
+        query_filter.update(channel_filter(channel))
+        return collection.count_documents(query_filter)
+    return collection.count_documents(query_filter, hint=RECENT_INDEX)
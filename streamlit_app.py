@@ -5,9 +5,12 @@ with MongoDB backend for real-time YouTube video data analysis
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import os
 import sys
-import re
+import asyncio
+import html
+from functools import lru_cache, partial
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -89,6 +92,20 @@ hr {
     height: 1px;
     background: linear-gradient(90deg, rgba(148, 163, 184, 0), rgba(148, 163, 184, 0.2), rgba(148, 163, 184, 0));
 }
+
+.msg {
+    padding: 0.75rem 1rem;
+    margin-bottom: 0.75rem;
+    border-radius: 8px;
+}
+
+.msg.user {
+    background: rgba(59, 130, 246, 0.12);
+}
+
+.msg.assistant {
+    background: rgba(148, 163, 184, 0.08);
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -120,126 +137,332 @@ try:
         get_videos_by_date_range,
         get_channel_stats,
         get_videos_last_24h,
+        count_videos_last_24h,
+        clear_query_cache,
+        CACHE_TTL_SECONDS,
     )
+    from chatbot.intents import intent_hits, channel_from_hits, search_keywords, query_entities
+    from chatbot.semantic_cache import SemanticCache
+    import numpy as np
     import pandas as pd
-    import plotly.graph_objects as go
     import plotly.express as px
 except ImportError as e:
     st.error(f"❌ Missing dependency: {e}")
     st.stop()
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHED READS  (one DB round-trip per TTL instead of one per rerun)
+# ═══════════════════════════════════════════════════════════════════════════════
+_READ_TTL = 30
+
+# Fields read by _fmt_videos / _videos_table; everything else stays server-side
+_CHAT_FIELDS = ("title", "channel", "channel_id", "view_count", "upload_date", "video_id", "url")
+_TABLE_FIELDS = ("title", "view_count", "like_count", "channel", "channel_id")
+
+# Videos page sort options → descending sort key applied by MongoDB
+_SORT_KEYS = {"Most Recent": "upload_date", "Most Viewed": "view_count", "Most Liked": "like_count"}
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_channel_stats():
+    return get_channel_stats()
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_channel_count(channel: str):
+    return count_videos_by_channel(channel)
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_top_videos(limit: int = 20, fields: tuple = None):
+    return get_top_videos(limit=limit, fields=fields)
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_recent_videos(limit: int = 10, channel: str = None, fields: tuple = None,
+                          sort_by: str = "upload_date"):
+    return get_recent_videos(limit=limit, channel=channel, fields=fields, sort_by=sort_by)
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_videos_last_24h(channel: str = None, fields: tuple = None):
+    return get_videos_last_24h(channel=channel, fields=fields)
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _cached_count_last_24h(channel: str = None):
+    return count_videos_last_24h(channel=channel)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_videos_collection():
+    return get_videos_collection()
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _total_count():
+    # collection metadata instead of a full count_documents({}) scan
+    return _get_videos_collection().estimated_document_count()
+
+
+@st.cache_data(ttl=_READ_TTL, show_spinner=False)
+def _channel_stats_df():
+    stats = _cached_channel_stats()
+    return pd.DataFrame({"channel": pd.Categorical(list(stats)), "count": list(stats.values())})
+
+
+def _clear_cached_reads():
+    for fn in (_total_count, _cached_channel_stats, _channel_stats_df, _cached_channel_count,
+               _cached_top_videos, _cached_recent_videos, _cached_videos_last_24h,
+               _cached_count_last_24h):
+        fn.clear()
+    # query_db's own TTL memo sits under the wrappers; drop it too so a manual
+    # refresh really re-reads the database
+    clear_query_cache()
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # GOOGLE API SETUP
 # ═══════════════════════════════════════════════════════════════════════════════
-_gemini_client = None
-if st.session_state.api_key:
+@st.cache_resource(show_spinner=False)
+def _get_gemini_client(api_key: str):
+    # one client (and HTTP connection pool) per key, shared across reruns
+    return genai.Client(api_key=api_key)
+
+
+def _gemini():
+    """Gemini client for the configured API key, or None."""
+    if not st.session_state.api_key:
+        return None
     try:
-        _gemini_client = genai.Client(api_key=st.session_state.api_key)
+        return _get_gemini_client(st.session_state.api_key)
     except Exception:
-        _gemini_client = None
+        return None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # DB-FIRST QUERY ENGINE  (always hits DB, then optionally polishes with Gemini)
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_WATCH_URL = "https://www.youtube.com/watch?v="
+
+
+def _fmt_video(i, v):
+    """One markdown entry for _fmt_videos."""
+    date = v.get("upload_date")
+    date = f"{date:%Y-%m-%d}" if isinstance(date, datetime) else (date or "N/A")[:10]
+    return (
+        f"{i}. **{v.get('title', 'N/A')}**  \n"
+        f"   📺 {v.get('channel') or v.get('channel_id') or 'N/A'} | 👁️ {v.get('view_count', 0):,} views | 📅 {date}  \n"
+        f"   🔗 [Watch]({v.get('url') or _WATCH_URL + v.get('video_id', '')})"
+    )
+
+
 def _fmt_videos(videos, limit=10):
     """Format video list into readable markdown."""
-    lines = []
-    for i, v in enumerate(videos[:limit], 1):
-        title   = v.get("title", "N/A")
-        channel = v.get("channel") or v.get("channel_id") or "N/A"
-        views   = v.get("view_count", 0)
-        date    = (v.get("upload_date") or "N/A")[:10]
-        vid_id  = v.get("video_id", "")
-        url     = v.get("url") or f"https://www.youtube.com/watch?v={vid_id}"
-        lines.append(
-            f"{i}. **{title}**  \n"
-            f"   📺 {channel} | 👁️ {views:,} views | 📅 {date}  \n"
-            f"   🔗 [Watch]({url})"
-        )
-    return "\n\n".join(lines)
+    return "\n\n".join(_fmt_video(i, v) for i, v in enumerate(videos[:limit], 1))
 
 
-def _query_and_answer(user_message: str) -> str:
-    """
-    Step 1 – query the real DB based on intent detection.
-    Step 2 – optionally ask Gemini to format/enrich the answer.
-    Step 3 – fallback: return plain formatted answer if Gemini fails.
-    """
+def _videos_table(videos):
+    """Display table for a video list, built column-wise rather than per row."""
+    df = pd.DataFrame(videos, columns=["title", "view_count", "like_count", "channel", "channel_id"])
+    channel = df["channel"].mask(df["channel"].eq("")).fillna(df["channel_id"])
+    return pd.DataFrame({
+        "Title": df["title"].fillna("N/A").str.slice(0, 50) + "...",
+        "Views": df["view_count"].fillna(0).astype("int64").map("{:,}".format),
+        "Likes": df["like_count"].fillna(0).astype("int64").map("{:,}".format),
+        "Channel": channel.mask(channel.eq("")).fillna("N/A"),
+    })
+
+
+def _in_script_ctx(query, ctx):
+    # st.cache_data needs the session's ScriptRunContext on the calling thread
+    add_script_run_ctx(ctx=ctx)
+    return query()
+
+
+async def _run_queries(jobs):
+    """Run blocking query helpers concurrently in worker threads."""
+    ctx = get_script_run_ctx()
+    return await asyncio.gather(*(asyncio.to_thread(_in_script_ctx, query, ctx) for query, _ in jobs))
+
+
+# ── formatters: query result → context lines ─────────────────────────────────
+_CHANNEL_LABELS = {"Bloomberg": "Bloomberg Markets"}
+
+
+def _fmt_channel_count(n, channel):
+    label = _CHANNEL_LABELS.get(channel, channel)
+    return [f"The YouTube Data API is currently tracking **{n} videos** from the {label} channel via our real-time PubSubHubbub webhook pipeline."]
+
+
+def _fmt_channel_totals(stats):
+    return [
+        f"Our YouTube pipeline has ingested **{sum(stats.values())} videos** in real-time across all monitored channels:"
+    ] + [f"• {ch}: {cnt} videos" for ch, cnt in stats.items()]
+
+
+def _fmt_24h(vids, ch=None):
+    if vids:
+        return [
+            f"✅ **{len(vids)} videos** have been ingested via webhook in the last 24 hours ({ch or 'all channels'}):\n\n"
+            + _fmt_videos(vids, 5)
+        ]
+    vids = _cached_recent_videos(limit=5, channel=ch, fields=_CHAT_FIELDS)
+    return [f"Latest videos streamed in from YouTube ({ch or 'all channels'}):\n\n" + _fmt_videos(vids, 5)]
+
+
+def _fmt_count_24h(n, ch=None):
+    return [f"✅ **{n} videos** have been ingested via webhook in the last 24 hours ({ch or 'all channels'})."]
+
+
+def _fmt_top(vids):
+    return [f"**🔥 Top {len(vids)} most viewed videos fetched from YouTube:**\n\n" + _fmt_videos(vids, len(vids))]
+
+
+def _fmt_search(results, kw):
+    if results:
+        return [f'**YouTube search results for "{kw}":**\n\n' + _fmt_videos(results, 5)]
+    return [f'No YouTube videos found matching "{kw}".']
+
+
+def _fmt_overview(stats):
+    return ["**Live channel overview (YouTube Data API):**\n"
+            + "\n".join(f"• {ch}: {cnt} videos" for ch, cnt in stats.items())]
+
+
+def _fmt_latest(vids):
+    return ["**🔴 Live — latest videos streamed from YouTube right now:**\n\n" + _fmt_videos(vids, len(vids))]
+
+
+# ── planners: user message → [(query, formatter), ...] ───────────────────────
+_CHANNEL_PARAM = {
+    "type": "STRING",
+    "description": "Channel name, e.g. 'Bloomberg' or 'ANI News India'",
+}
+_LIMIT_PARAM = {"type": "INTEGER", "description": "Number of videos (1-20)"}
+
+# query_db helpers exposed to Gemini function calling
+_TOOLS = [{"function_declarations": [
+    {"name": "count_videos_by_channel", "description": "Count videos ingested from one channel",
+     "parameters": {"type": "OBJECT", "properties": {"channel": _CHANNEL_PARAM}, "required": ["channel"]}},
+    {"name": "get_channel_stats", "description": "Video counts for every monitored channel (totals, overview)",
+     "parameters": {"type": "OBJECT", "properties": {}}},
+    {"name": "get_videos_last_24h", "description": "Videos published in the last 24 hours, optionally for one channel",
+     "parameters": {"type": "OBJECT", "properties": {"channel": _CHANNEL_PARAM}}},
+    {"name": "count_videos_last_24h", "description": "How many videos were published in the last 24 hours, optionally for one channel",
+     "parameters": {"type": "OBJECT", "properties": {"channel": _CHANNEL_PARAM}}},
+    {"name": "get_top_videos", "description": "Most viewed / popular / trending videos",
+     "parameters": {"type": "OBJECT", "properties": {"limit": _LIMIT_PARAM}}},
+    {"name": "search_videos", "description": "Full-text search of video titles and descriptions",
+     "parameters": {"type": "OBJECT", "properties": {"text_query": {"type": "STRING"}}, "required": ["text_query"]}},
+    {"name": "get_recent_videos", "description": "Latest videos, optionally for one channel",
+     "parameters": {"type": "OBJECT", "properties": {"limit": _LIMIT_PARAM, "channel": _CHANNEL_PARAM}}},
+]}]
+_TOOL_CONFIG = {"function_calling_config": {"mode": "ANY"}}
+
+
+def _tool_job(name: str, args: dict):
+    """Map one Gemini function call onto a (query, formatter) pair."""
+    channel = args.get("channel") or None
+    limit = max(1, min(int(args.get("limit") or 10), 20))
+    if name == "count_videos_by_channel" and channel:
+        return partial(_cached_channel_count, channel), partial(_fmt_channel_count, channel=channel)
+    if name == "get_channel_stats":
+        return _cached_channel_stats, _fmt_overview
+    if name == "get_videos_last_24h":
+        return partial(_cached_videos_last_24h, channel=channel, fields=_CHAT_FIELDS), partial(_fmt_24h, ch=channel)
+    if name == "count_videos_last_24h":
+        return partial(_cached_count_last_24h, channel), partial(_fmt_count_24h, ch=channel)
+    if name == "get_top_videos":
+        return partial(_cached_top_videos, limit=limit, fields=_CHAT_FIELDS), _fmt_top
+    if name == "search_videos" and args.get("text_query"):
+        kw = args["text_query"]
+        return partial(search_videos, text_query=kw, limit=5, fields=_CHAT_FIELDS), partial(_fmt_search, kw=kw)
+    if name == "get_recent_videos":
+        return partial(_cached_recent_videos, limit=limit, channel=channel, fields=_CHAT_FIELDS), _fmt_latest
+    return None
+
+
+def _plan_with_tools(client, user_message: str) -> list:
+    """Let Gemini pick the query helpers (parallel calls allowed); [] on failure."""
+    try:
+        resp = client.models.generate_content(
+            model="gemini-1.5-flash",
+            contents=user_message,
+            config={"tools": _TOOLS, "tool_config": _TOOL_CONFIG},
+        )
+    except Exception:
+        return []
+    jobs, seen = [], set()
+    for call in getattr(resp, "function_calls", None) or []:
+        args = dict(call.args or {})
+        key = (call.name, repr(sorted(args.items())))
+        job = None if key in seen else _tool_job(call.name, args)
+        if job:
+            seen.add(key)
+            jobs.append(job)
+    return jobs
+
+
+def _plan_with_keywords(user_message: str) -> list:
+    """Keyword intent heuristics, used when Gemini is unavailable."""
     msg = user_message.lower()
-    context_parts = []
+    hits = intent_hits(msg)
+    ch = channel_from_hits(hits)
+    jobs = []
 
     # ── count / how many ──────────────────────────────────────────────────
-    if any(w in msg for w in ["how many", "count", "total", "number of"]):
-        if "bloomberg" in msg:
-            n = count_videos_by_channel("Bloomberg")
-            context_parts.append(f"The YouTube Data API is currently tracking **{n} videos** from the Bloomberg Markets channel via our real-time PubSubHubbub webhook pipeline.")
-        elif "ani" in msg or "news india" in msg:
-            n = count_videos_by_channel("ANI News India")
-            context_parts.append(f"The YouTube Data API is currently tracking **{n} videos** from the ANI News India channel via our real-time PubSubHubbub webhook pipeline.")
+    if "count" in hits and "recent" in hits:
+        # only a number is wanted, so count server-side instead of listing
+        jobs.append((partial(_cached_count_last_24h, ch), partial(_fmt_count_24h, ch=ch)))
+    elif "count" in hits:
+        if ch:
+            jobs.append((partial(_cached_channel_count, ch), partial(_fmt_channel_count, channel=ch)))
         else:
-            stats = get_channel_stats()
-            total = sum(stats.values())
-            context_parts.append(f"Our YouTube pipeline has ingested **{total} videos** in real-time across all monitored channels:")
-            for ch, cnt in stats.items():
-                context_parts.append(f"• {ch}: {cnt} videos")
+            jobs.append((_cached_channel_stats, _fmt_channel_totals))
 
     # ── last 24 h / today / recent / latest ───────────────────────────────
-    if any(w in msg for w in ["24h", "24 h", "last 24", "today", "recent", "latest"]):
-        ch = None
-        if "bloomberg" in msg:
-            ch = "Bloomberg"
-        elif "ani" in msg or "news india" in msg:
-            ch = "ANI News India"
-        vids = get_videos_last_24h(channel=ch)
-        if vids:
-            context_parts.append(
-                f"✅ **{len(vids)} videos** have been ingested via webhook in the last 24 hours ({ch or 'all channels'}):\n\n"
-                + _fmt_videos(vids, 5)
-            )
-        else:
-            vids = get_recent_videos(limit=5, channel=ch)
-            context_parts.append(
-                f"Latest videos streamed in from YouTube ({ch or 'all channels'}):\n\n" + _fmt_videos(vids, 5)
-            )
+    elif "recent" in hits:
+        jobs.append((partial(_cached_videos_last_24h, channel=ch, fields=_CHAT_FIELDS), partial(_fmt_24h, ch=ch)))
 
     # ── popular / top / trending ──────────────────────────────────────────
-    if any(w in msg for w in ["popular", "top", "most viewed", "trending", "viral", "best"]):
-        vids = get_top_videos(limit=10)
-        context_parts.append("**🔥 Top 10 most viewed videos fetched from YouTube:**\n\n" + _fmt_videos(vids, 10))
+    if "popular" in hits:
+        jobs.append((partial(_cached_top_videos, limit=10, fields=_CHAT_FIELDS), _fmt_top))
 
     # ── keyword search using quoted terms or common prepositions ──────────
-    keywords = re.findall(r'"([^"]+)"', user_message)
-    if not keywords:
-        for prep in ["about", "on", "regarding", "related to", "for"]:
-            idx = msg.find(prep + " ")
-            if idx != -1:
-                snippet = user_message[idx + len(prep) + 1:].split()[:4]
-                if snippet:
-                    keywords = [" ".join(snippet)]
-                break
-    for kw in keywords[:2]:
-        results = search_videos(text_query=kw, limit=5)
-        if results:
-            context_parts.append(f'**YouTube search results for "{kw}":**\n\n' + _fmt_videos(results, 5))
-        else:
-            context_parts.append(f'No YouTube videos found matching "{kw}".')
+    for kw in search_keywords(user_message)[:2]:
+        jobs.append((partial(search_videos, text_query=kw, limit=5, fields=_CHAT_FIELDS), partial(_fmt_search, kw=kw)))
 
     # ── channel overview / stats / analytics ──────────────────────────────
-    if any(w in msg for w in ["channel", "stat", "overview", "summary", "analytics", "dashboard"]):
-        stats = get_channel_stats()
-        lines = [f"• {ch}: {cnt} videos" for ch, cnt in stats.items()]
-        context_parts.append("**Live channel overview (YouTube Data API):**\n" + "\n".join(lines))
+    if "channel" in hits:
+        jobs.append((_cached_channel_stats, _fmt_overview))
+
+    return jobs
+
+
+def _answer_from_db(user_message: str, placeholder=None) -> str:
+    """
+    Step 1 – pick the DB queries (Gemini function calling, else keywords).
+    Step 2 – run them concurrently and stitch the results in order.
+    Step 3 – optionally ask Gemini to format/enrich the answer, streaming it
+             into `placeholder` (an st.empty()) when one is given.
+    Step 4 – fallback: return plain formatted answer if Gemini fails.
+    """
+    client = _gemini()
+    jobs = (client and _plan_with_tools(client, user_message)) or _plan_with_keywords(user_message)
 
     # ── default: show recent videos ───────────────────────────────────────
-    if not context_parts:
-        vids = get_recent_videos(limit=8)
-        context_parts.append("**🔴 Live — latest videos streamed from YouTube right now:**\n\n" + _fmt_videos(vids, 8))
+    if not jobs:
+        jobs.append((partial(_cached_recent_videos, limit=8, fields=_CHAT_FIELDS), _fmt_latest))
+
+    results = asyncio.run(_run_queries(jobs))
+    context_parts = []
+    for (_, fmt), result in zip(jobs, results):
+        context_parts.extend(fmt(result))
 
     db_context = "\n\n".join(context_parts)
 
     # ── Optional Gemini polish ────────────────────────────────────────────
-    if _gemini_client:
+    if client:
         try:
             prompt = (
                 f'You are a YouTube analytics assistant for a real-time cloud pipeline. The user asked: "{user_message}"\n\n'
@@ -249,18 +472,92 @@ def _query_and_answer(user_message: str) -> str:
                 "Never mention 'database', 'cache', or 'saved'. Use language like 'live feed', 'real-time', 'fetched from YouTube', 'ingested via webhook'. "
                 "Be friendly and informative."
             )
-            resp = _gemini_client.models.generate_content(
+            # Stream tokens into the placeholder as they arrive
+            text = ""
+            for chunk in client.models.generate_content_stream(
                 model="gemini-1.5-flash",
                 contents=prompt,
-            )
-            text = getattr(resp, "text", None)
-            if text and len(text.strip()) > 20:
+            ):
+                text += getattr(chunk, "text", None) or ""
+                if placeholder is not None:
+                    placeholder.markdown(text)
+            if len(text.strip()) > 20:
                 return text.strip()
         except Exception:
             pass  # fall through to plain answer
 
     return f"📡 **Live from YouTube pipeline:**\n\n{db_context}"
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# SEMANTIC RESPONSE CACHE  (near-duplicate prompts skip the DB + Gemini path)
+# ═══════════════════════════════════════════════════════════════════════════════
+_EMBED_MODEL = "text-embedding-004"
+_SEM_CACHE_SIZE = 128
+_SEM_CACHE_THRESHOLD = 0.92
+
+
+def _embed(text: str):
+    """Unit-length Gemini embedding of `text`, or None when unavailable."""
+    client = _gemini()
+    if not client:
+        return None
+    try:
+        resp = client.models.embed_content(model=_EMBED_MODEL, contents=text)
+        vec = np.asarray(resp.embeddings[0].values, dtype=np.float32)
+    except Exception:
+        return None
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else None
+
+
+def _query_and_answer(user_message: str, placeholder=None) -> str:
+    """
+    Answer from the per-session semantic cache when a recent prompt is close
+    enough (cosine similarity) and asks for the same channel, time window and
+    intent; otherwise run the DB + Gemini path and cache it.
+    Entries expire with the query cache TTL so answers stay live.
+    """
+    if "sem_cache" not in st.session_state:
+        st.session_state.sem_cache = SemanticCache(_SEM_CACHE_THRESHOLD, _SEM_CACHE_SIZE, CACHE_TTL_SECONDS)
+    cache = st.session_state.sem_cache
+
+    emb = _embed(user_message)
+    key = query_entities(user_message)
+    answer = cache.get(emb, key)
+    if answer is None:
+        answer = _answer_from_db(user_message, placeholder)
+        cache.put(emb, key, answer)
+    return answer
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CHAT HISTORY RENDERING
+# ═══════════════════════════════════════════════════════════════════════════════
+_HISTORY_BATCH_AFTER = 20
+_HISTORY_LIVE_TAIL = 5
+
+try:
+    import markdown as _markdown
+except ImportError:
+    _markdown = None
+
+
+@lru_cache(maxsize=512)
+def _to_html(content: str) -> str:
+    # Escape first: user input and model output must never become live markup
+    # once rendered with unsafe_allow_html
+    safe = html.escape(content, quote=False)
+    if _markdown is not None:
+        return _markdown.markdown(safe)
+    return safe.replace("\n", "<br>")
+
+
+def _history_html(messages) -> str:
+    """Older chat turns as a single HTML string (one websocket delta)."""
+    return "".join(
+        f'<div class="msg {m["role"]}">{"🧑" if m["role"] == "user" else "🤖"} {_to_html(m["content"])}</div>'
+        for m in messages
+    )
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN UI LAYOUT
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -274,6 +571,7 @@ with col2:
     st.markdown("")
     st.markdown("")
     if st.button("🔄", help="Refresh data"):
+        _clear_cached_reads()
         st.rerun()
 
 st.divider()
@@ -318,8 +616,12 @@ if selected == "🤖 Chat Assistant":
             answer = _query_and_answer(query)
         st.session_state.messages.append({"role": "assistant", "content": answer})
 
-    # Display chat history
-    for message in st.session_state.messages:
+    # Display chat history; long histories send older turns as one HTML block
+    history = st.session_state.messages
+    if len(history) > _HISTORY_BATCH_AFTER:
+        st.markdown(_history_html(history[:-_HISTORY_LIVE_TAIL]), unsafe_allow_html=True)
+        history = history[-_HISTORY_LIVE_TAIL:]
+    for message in history:
         with st.chat_message(message["role"], avatar="🧑" if message["role"] == "user" else "🤖"):
             st.markdown(message["content"])
     
@@ -336,8 +638,9 @@ if selected == "🤖 Chat Assistant":
         # Get AI response
         with st.chat_message("assistant", avatar="🤖"):
             with st.spinner("🔴 Fetching live data from YouTube API..."):
-                response = _query_and_answer(user_input)
-                st.markdown(response)
+                placeholder = st.empty()
+                response = _query_and_answer(user_input, placeholder)
+                placeholder.markdown(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -350,22 +653,21 @@ elif selected == "📊 Analytics":
         # Get stats
         col1, col2, col3, col4 = st.columns(4)
         
-        collection = get_videos_collection()
-        total_videos = collection.count_documents({})
+        total_videos = _total_count()
         
         with col1:
             st.metric("📊 Total Videos", total_videos, delta=None)
         
         with col2:
-            bloomberg_count = count_videos_by_channel("Bloomberg")
+            bloomberg_count = _cached_channel_count("Bloomberg")
             st.metric("📺 Bloomberg Videos", bloomberg_count)
         
         with col3:
-            ani_count = count_videos_by_channel("ANI News India")
+            ani_count = _cached_channel_count("ANI News India")
             st.metric("🇮🇳 ANI News Videos", ani_count)
         
         with col4:
-            videos_24h = len(get_videos_last_24h())
+            videos_24h = _cached_count_last_24h()
             st.metric("⏰ Last 24h", videos_24h)
         
         st.divider()
@@ -375,31 +677,22 @@ elif selected == "📊 Analytics":
         
         with col1:
             st.markdown("### 🔥 Top 10 Most Viewed Videos")
-            popular = get_top_videos(limit=10)
+            popular = _cached_top_videos(limit=10, fields=_TABLE_FIELDS)
             if popular:
-                df_popular = pd.DataFrame([
-                    {
-                        "Title": v.get("title", "N/A")[:50] + "...",
-                        "Views": f"{v.get('view_count', 0):,}",
-                        "Likes": f"{v.get('like_count', 0):,}",
-                        "Channel": v.get("channel") or v.get("channel_id") or "N/A"
-                    }
-                    for v in popular
-                ])
-                st.dataframe(df_popular, use_container_width=True, hide_index=True)
+                st.dataframe(_videos_table(popular), use_container_width=True, hide_index=True)
         
         with col2:
             st.markdown("### 📊 Videos by Channel")
             try:
-                stats = get_channel_stats()
-                if stats:
-                    fig = go.Figure(data=[
-                        go.Bar(
-                            x=list(stats.keys()),
-                            y=list(stats.values()),
-                            marker_color=['#3b82f6', '#ef4444'],
-                        )
-                    ])
+                df_stats = _channel_stats_df()
+                if not df_stats.empty:
+                    fig = px.bar(
+                        df_stats,
+                        x="channel",
+                        y="count",
+                        color="channel",
+                        color_discrete_sequence=['#3b82f6', '#ef4444'],
+                    )
                     fig.update_layout(
                         height=350,
                         template="plotly_dark",
@@ -414,7 +707,7 @@ elif selected == "📊 Analytics":
         
         # Recently added
         st.markdown("### 🔴 Live Feed — Latest Videos from YouTube")
-        recent = get_recent_videos(limit=10)
+        recent = _cached_recent_videos(limit=10)
         if recent:
             for i, video in enumerate(recent[:10], 1):
                 with st.expander(f"🎥 {i}. {video.get('title', 'No title')[:60]}..."):
@@ -449,28 +742,22 @@ elif selected == "🎥 Videos":
         )
     
     with col3:
-        sort_by = st.selectbox("Sort by", ["Most Recent", "Most Viewed", "Most Liked"])
+        sort_by = st.selectbox("Sort by", list(_SORT_KEYS))
     
     st.divider()
     
     # Get videos
     try:
         if search_query:
-            videos = search_videos(text_query=search_query, limit=20)
+            videos = search_videos(text_query=search_query, limit=20, sort_by=_SORT_KEYS[sort_by])
         elif channel_filter != "All Channels":
-            videos = get_videos_by_channel(channel_filter, limit=20)
+            videos = get_videos_by_channel(channel_filter, limit=20, sort_by=_SORT_KEYS[sort_by])
         else:
-            videos = get_recent_videos(limit=20)
+            videos = _cached_recent_videos(limit=20, sort_by=_SORT_KEYS[sort_by])
         
         if not videos:
             st.info("No videos found matching your criteria")
         else:
-            # Sort
-            if sort_by == "Most Viewed":
-                videos = sorted(videos, key=lambda x: x.get("view_count", 0), reverse=True)
-            elif sort_by == "Most Liked":
-                videos = sorted(videos, key=lambda x: x.get("like_count", 0), reverse=True)
-            
             # Display
             for i, video in enumerate(videos[:20], 1):
                 vid_id  = video.get('video_id', '')
@@ -502,9 +789,8 @@ elif selected == "⚙️ Settings":
     with col1:
         st.markdown("### 📡 System Status")
         try:
-            collection = get_videos_collection()
+            count = _total_count()
             status = "✅ Connected"
-            count = collection.count_documents({})
             st.success(f"{status}")
             st.metric("Videos Ingested via Webhook", count)
             st.info("Backend: **MongoDB Atlas** · YouTube Data API v3 · PubSubHubbub")
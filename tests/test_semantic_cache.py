@@ -0,0 +1,39 @@
+"""Semantic answer cache: similarity alone must not cross channels or time windows."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from chatbot.intents import query_entities
+from chatbot.semantic_cache import SemanticCache
+
+
+def _unit(*values):
+    vec = np.asarray(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def test_questions_differing_only_by_channel_do_not_share_answers():
+    cache = SemanticCache(threshold=0.92)
+    emb = _unit(1.0, 0.0, 0.0)  # the embedder rates the two prompts as near-identical
+    bloomberg = "How many videos did Bloomberg upload today?"
+    ani = "How many videos did ANI News India upload today?"
+    assert query_entities(bloomberg) != query_entities(ani)
+
+    cache.put(emb, query_entities(bloomberg), "Bloomberg: 12 videos", now=0)
+    assert cache.get(emb, query_entities(ani), now=1) is None
+    assert cache.get(emb, query_entities(bloomberg), now=1) == "Bloomberg: 12 videos"
+
+
+def test_time_window_is_part_of_the_key():
+    assert query_entities("top videos in the last 7 days") != query_entities("top videos in the last 30 days")
+    assert query_entities("latest videos from Reuters") != query_entities("latest videos from CNBC")
+
+
+def test_rephrased_question_hits_within_threshold_and_ttl():
+    cache = SemanticCache(threshold=0.92, ttl=60)
+    key = query_entities("What's trending on Bloomberg?")
+    assert key == query_entities("what is trending on bloomberg")
+    cache.put(_unit(1.0, 0.0, 0.0), key, "answer", now=0)
+    assert cache.get(_unit(1.0, 0.1, 0.0), key, now=30) == "answer"
+    assert cache.get(_unit(0.0, 1.0, 0.0), key, now=30) is None
+    assert cache.get(_unit(1.0, 0.0, 0.0), key, now=61) is None
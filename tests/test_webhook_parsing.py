@@ -0,0 +1,79 @@
+"""Atom notification parsing: regex fast path and XML fallback, body reading."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from webhook.webhook_app import _fast_entries, _parse_atom_sync, _read_body
+
+FEED = b"""<?xml version='1.0' encoding='UTF-8'?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+ <entry>
+  <yt:videoId>VIDEO_ID_01</yt:videoId>
+  %(title)s
+  %(link)s
+  <author>
+   <name>Bloomberg Markets</name>
+   <uri>http://www.youtube.com/channel/UCIALMKvObZNtJ6AmdCLP7Lg</uri>
+  </author>
+  <published>2015-03-06T21:40:57+00:00</published>
+ </entry>
+</feed>"""
+
+
+def _feed(title, link):
+    return bytearray(FEED % {b"title": title, b"link": link})
+
+
+def test_plain_feed_uses_fast_path():
+    body = _feed(b"<title>Markets &amp; more</title>",
+                 b'<link rel="alternate" href="http://www.youtube.com/watch?v=VIDEO_ID_01"/>')
+    entries = _fast_entries(body)
+    assert entries is not None
+    assert entries[0].video_id == "VIDEO_ID_01"
+    assert entries[0].title == "Markets & more"
+    assert entries[0].channel == "Bloomberg Markets"
+
+
+def test_attributed_title_and_single_quoted_href():
+    body = _feed(b'<title type="text">Markets close</title>',
+                 b"<link rel='alternate' href='http://www.youtube.com/watch?v=VIDEO_ID_01'/>")
+    (entry,) = _parse_atom_sync(body)
+    assert entry.video_id == "VIDEO_ID_01"
+    assert entry.url == "http://www.youtube.com/watch?v=VIDEO_ID_01"
+    assert entry.title == "Markets close"
+    assert entry.channel == "Bloomberg Markets"
+    assert entry.upload_date == "2015-03-06T21:40:57+00:00"
+
+
+def test_missing_required_field_falls_back_to_xml_parser():
+    # a title the regexes cannot read (nested markup) must not be dropped
+    body = _feed(b'<title type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">x</div></title>',
+                 b'<link rel="alternate" href="http://www.youtube.com/watch?v=VIDEO_ID_01"/>')
+    assert _fast_entries(body) is None
+    (entry,) = _parse_atom_sync(body)
+    assert entry.video_id == "VIDEO_ID_01"
+    assert entry.channel == "Bloomberg Markets"
+
+
+class _FakeRequest:
+    def __init__(self, content_length, body=b""):
+        self.headers = {"Content-Length": content_length}
+        self._body = body
+
+    async def stream(self):
+        yield self._body
+
+
+@pytest.mark.parametrize("value", ["-5", " 5", "+5", "1_0", "abc", ""])
+def test_read_body_rejects_malformed_content_length(value):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(_read_body(_FakeRequest(value)))
+    assert exc.value.status_code == 400
+
+
+def test_read_body_trims_overstated_content_length():
+    assert asyncio.run(_read_body(_FakeRequest("10", b"abc"))) == b"abc"
@@ -4,8 +4,11 @@ Manages PubSubHubbub subscriptions to YouTube channel feeds.
 Handles subscription creation, renewal, and health checks.
 """
 import os
+import asyncio
 import logging
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional
 from dotenv import load_dotenv
@@ -41,13 +44,79 @@ CHANNEL_NAMES = {
     "UCtFQDgA8J8_iiwc5-KoAQlg": "ANI News India",
 }
 
+# Single-channel calls share one keep-alive session; batch runs use the
+# async client below with at most MAX_WORKERS connections
+MAX_WORKERS = 8
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
+
+
+_FEED_URL_BASE = "https://www.youtube.com/xml/feeds/videos.xml?channel_id="
+
+# Per-process constants, resolved once at import
+_FEED_URLS = {cid: f"{_FEED_URL_BASE}{cid}" for cid in CHANNEL_IDS}
+_CALLBACK = f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}"
+_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+
 
 def get_channel_feed_url(channel_id: str) -> str:
     """
     Construct the YouTube channel feed URL for PubSubHubbub.
     YouTube feeds follow: https://www.youtube.com/xml/feeds/videos.xml?channel_id=CHANNEL_ID
     """
-    return f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+    return _FEED_URLS.get(channel_id) or f"{_FEED_URL_BASE}{channel_id}"
+
+
+def _build_data(channel_id: str, mode: str) -> dict:
+    """Hub form payload for `mode` ("subscribe" or "unsubscribe")."""
+    data = {
+        "hub.callback": _CALLBACK,
+        "hub.mode": mode,
+        "hub.topic": get_channel_feed_url(channel_id),
+    }
+    if mode == "subscribe":
+        data["hub.lease_seconds"] = "432000"  # 5 days
+        data["hub.secret"] = _SECRET
+    return data
+
+
+def _parse_result(status_code: int, channel_id: str, mode: str) -> Tuple[bool, str]:
+    """Map a hub response status onto the (success, message) convention."""
+    channel_name = CHANNEL_NAMES.get(channel_id, channel_id)
+    if mode == "subscribe":
+        if status_code in [204, 200]:
+            return True, f"Successfully subscribed to {channel_name}"
+        if status_code == 202:
+            return True, f"Subscription request accepted for {channel_name}"
+        return False, f"Failed to subscribe to {channel_name}: HTTP {status_code}"
+    if status_code in [204, 200, 202]:
+        return True, f"Unsubscribed from {channel_name}"
+    return False, f"Failed to unsubscribe from {channel_name}: HTTP {status_code}"
+
+
+def _post_sync(channel_id: str, mode: str) -> Tuple[bool, str]:
+    """Send one hub request on the shared keep-alive session."""
+    channel_name = CHANNEL_NAMES.get(channel_id, channel_id)
+    try:
+        response = _SESSION.post(PUBSUB_HUB_URL, data=_build_data(channel_id, mode), timeout=30)
+    except requests.exceptions.Timeout:
+        error_msg = "Timeout while connecting to PubSubHubbub hub"
+        logger.error(error_msg)
+        return False, error_msg
+    except Exception as e:
+        error_msg = f"Failed to {mode} {channel_name}: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+    
+    logger.info(f"{mode.capitalize()} response status: {response.status_code}")
+    logger.debug(f"Response body: {response.text}")
+    success, message = _parse_result(response.status_code, channel_id, mode)
+    if success:
+        logger.info(f"✓ {message}")
+    else:
+        logger.error(message)
+        logger.error(f"Response: {response.text}")
+    return success, message
 
 
 def subscribe_to_channel(channel_id: str) -> Tuple[bool, str]:
@@ -62,61 +131,7 @@ def subscribe_to_channel(channel_id: str) -> Tuple[bool, str]:
     """
     channel_name = CHANNEL_NAMES.get(channel_id, channel_id)
     logger.info(f"Subscribing to channel: {channel_name} ({channel_id})")
-    
-    # Construct the topic (channel feed URL)
-    topic = get_channel_feed_url(channel_id)
-    
-    # Construct the callback URL
-    callback = f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}"
-    
-    # Prepare subscription request
-    data = {
-        "hub.callback": callback,
-        "hub.mode": "subscribe",
-        "hub.topic": topic,
-        "hub.lease_seconds": "432000",  # 5 days
-        "hub.secret": os.environ.get("WEBHOOK_SECRET", ""),
-    }
-    
-    try:
-        logger.debug(f"Sending subscription request to: {PUBSUB_HUB_URL}")
-        logger.debug(f"Topic: {topic}")
-        logger.debug(f"Callback: {callback}")
-        
-        response = requests.post(
-            PUBSUB_HUB_URL,
-            data=data,
-            timeout=30
-        )
-        
-        logger.info(f"Subscription response status: {response.status_code}")
-        logger.debug(f"Response headers: {response.headers}")
-        logger.debug(f"Response body: {response.text}")
-        
-        if response.status_code in [204, 200]:
-            logger.info(f"✓ Successfully subscribed to {channel_name}")
-            return True, f"Successfully subscribed to {channel_name}"
-        elif response.status_code == 202:
-            logger.info(f"✓ Subscription request accepted for {channel_name} (async processing)")
-            return True, f"Subscription request accepted for {channel_name}"
-        else:
-            error_msg = f"Failed to subscribe to {channel_name}: HTTP {response.status_code}"
-            logger.error(error_msg)
-            logger.error(f"Response: {response.text}")
-            return False, error_msg
-            
-    except requests.exceptions.Timeout:
-        error_msg = f"Timeout while connecting to PubSubHubbub hub"
-        logger.error(error_msg)
-        return False, error_msg
-    except requests.exceptions.RequestException as e:
-        error_msg = f"Failed to subscribe to {channel_name}: {str(e)}"
-        logger.error(error_msg)
-        return False, error_msg
-    except Exception as e:
-        error_msg = f"Unexpected error subscribing to {channel_name}: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        return False, error_msg
+    return _post_sync(channel_id, "subscribe")
 
 
 def unsubscribe_from_channel(channel_id: str) -> Tuple[bool, str]:
@@ -131,35 +146,36 @@ def unsubscribe_from_channel(channel_id: str) -> Tuple[bool, str]:
     """
     channel_name = CHANNEL_NAMES.get(channel_id, channel_id)
     logger.info(f"Unsubscribing from channel: {channel_name} ({channel_id})")
-    
-    topic = get_channel_feed_url(channel_id)
-    callback = f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}"
-    
-    data = {
-        "hub.callback": callback,
-        "hub.mode": "unsubscribe",
-        "hub.topic": topic,
-    }
-    
+    return _post_sync(channel_id, "unsubscribe")
+
+
+try:
+    import h2  # noqa: F401 -- lets httpx multiplex requests over HTTP/2
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+async def _subscribe_one(client: httpx.AsyncClient, channel_id: str,
+                         mode: str = "subscribe") -> Tuple[bool, str]:
     try:
-        response = requests.post(
-            PUBSUB_HUB_URL,
-            data=data,
-            timeout=30
-        )
-        
-        if response.status_code in [204, 200, 202]:
-            logger.info(f"✓ Successfully unsubscribed from {channel_name}")
-            return True, f"Unsubscribed from {channel_name}"
-        else:
-            error_msg = f"Failed to unsubscribe from {channel_name}: HTTP {response.status_code}"
-            logger.error(error_msg)
-            return False, error_msg
-            
+        response = await client.post(PUBSUB_HUB_URL, data=_build_data(channel_id, mode), timeout=30)
     except Exception as e:
-        error_msg = f"Failed to unsubscribe from {channel_name}: {str(e)}"
-        logger.error(error_msg)
-        return False, error_msg
+        # one channel's failure must not abort the whole gather
+        channel_name = CHANNEL_NAMES.get(channel_id, channel_id)
+        return False, f"Failed to {mode} {channel_name}: {str(e)}"
+    return _parse_result(response.status_code, channel_id, mode)
+
+
+async def subscribe_all_channels_async(mode: str = "subscribe") -> List[Tuple[bool, str]]:
+    """
+    Send the hub request for every channel concurrently over one client;
+    with HTTP/2 available they share a single multiplexed connection.
+    Results follow CHANNEL_IDS order.
+    """
+    limits = httpx.Limits(max_connections=MAX_WORKERS)
+    async with httpx.AsyncClient(http2=_HTTP2, limits=limits) as client:
+        return await asyncio.gather(*(_subscribe_one(client, cid, mode) for cid in CHANNEL_IDS))
 
 
 def subscribe_all_channels() -> Tuple[int, int]:
@@ -176,8 +192,7 @@ def subscribe_all_channels() -> Tuple[int, int]:
     successful = 0
     failed = 0
     
-    for channel_id in CHANNEL_IDS:
-        success, message = subscribe_to_channel(channel_id)
+    for success, message in asyncio.run(subscribe_all_channels_async("subscribe")):
         logger.info(message)
         
         if success:
@@ -206,8 +221,7 @@ def unsubscribe_all_channels() -> Tuple[int, int]:
     successful = 0
     failed = 0
     
-    for channel_id in CHANNEL_IDS:
-        success, message = unsubscribe_from_channel(channel_id)
+    for success, message in asyncio.run(subscribe_all_channels_async("unsubscribe")):
         logger.info(message)
         
         if success:
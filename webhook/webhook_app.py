@@ -3,18 +3,37 @@ webhook/webhook_app.py
 FastAPI webhook receiver for PubSubHubbub notifications.
 Handles YouTube video publish notifications in real-time.
 """
+import io
 import os
-import hashlib
+import re
+import sys
+import html
 import hmac
+import hashlib
+import time
 import xml.etree.ElementTree as ET
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
-from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
-from fastapi.responses import PlainTextResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import uvicorn
 import asyncio
+from dotenv import load_dotenv
+
+# Settings below are read at import, so .env must be loaded first
+load_dotenv(override=True)
 
-from db import build_video_doc, upsert_video
+from db import build_video_doc, bulk_upsert_videos_async, get_videos_collection
+
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
 
 # Configure logging
 logging.basicConfig(
@@ -23,20 +42,225 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="YouTube Video Ingestion Webhook")
+app = FastAPI(title="YouTube Video Ingestion Webhook", default_response_class=ORJSONResponse)
+# Only bodies of 1 KiB+ are compressed; set WEBHOOK_GZIP=0 behind a proxy
+# that already gzips (envoy/nginx)
+if os.environ.get("WEBHOOK_GZIP", "1").lower() not in ("0", "false", "no"):
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# PubSubHubbub Atom notifications are a few KB; larger bodies are rejected
+# before any of them is read or hashed
+MAX_BODY_BYTES = int(os.environ.get("WEBHOOK_MAX_BODY_BYTES", 64 * 1024))
+
+# Clark-notation tags/paths, so lookups skip per-call prefix resolution
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_ATOM_ENTRY = _ATOM + "entry"
+_ATOM_LINK = _ATOM + "link"
+_ATOM_TITLE = _ATOM + "title"
+_ATOM_AUTHOR_NAME = _ATOM + "author/" + _ATOM + "name"
+_ATOM_AUTHOR_URI = _ATOM + "author/" + _ATOM + "uri"
+_ATOM_PUBLISHED = _ATOM + "published"
+_ATOM_UPDATED = _ATOM + "updated"
+_ENTRY_FIELDS = (
+    ("title", _ATOM_TITLE),
+    ("channel", _ATOM_AUTHOR_NAME),
+    ("channel_url", _ATOM_AUTHOR_URI),
+    ("upload_date", _ATOM_PUBLISHED),
+)
+
+# 11-character YouTube video ID from a watch URL's query string
+_VID_RE = re.compile(r"[?&]v=([A-Za-z0-9_-]{11})")
+# Signing settings are read once at startup (after .env is loaded); each
+# request copies the keyed HMAC state instead of re-deriving the padded
+# inner/outer keys
+_HMAC_TEMPLATE = None
+# Strict mode: with a secret configured, unsigned notifications are rejected
+# before the body is parsed
+REQUIRE_SIGNATURE = False
+
+
+@app.on_event("startup")
+async def _load_signing_settings():
+    global _HMAC_TEMPLATE, REQUIRE_SIGNATURE
+    secret = os.environ.get("WEBHOOK_SECRET", "").encode()
+    _HMAC_TEMPLATE = hmac.new(secret, b"", hashlib.sha1) if secret else None
+    REQUIRE_SIGNATURE = os.environ.get("WEBHOOK_REQUIRE_SIGNATURE", "").lower() in ("1", "true", "yes")
+    if _HMAC_TEMPLATE is None:
+        logger.warning("WEBHOOK_SECRET is not set; notification signatures will NOT be verified")
+
+_XML_ERRORS = (ET.ParseError,) + ((LET.XMLSyntaxError,) if LET is not None else ())
+
+
+def _iter_entries(body: bytes):
+    """
+    Stream Atom <entry> elements out of the feed body, freeing each one once
+    the caller is done with it. Uses libxml2 via lxml when installed.
+    """
+    if LET is not None:
+        for _, entry in LET.iterparse(io.BytesIO(body), events=("end",), tag=_ATOM_ENTRY):
+            yield entry
+            entry.clear()
+            while entry.getprevious() is not None:
+                del entry.getparent()[0]
+    else:
+        for _, elem in ET.iterparse(io.BytesIO(body), events=("end",)):
+            if elem.tag == _ATOM_ENTRY:
+                yield elem
+                elem.clear()
+
+
+@dataclass(slots=True)
+class VideoNotification:
+    """One video announced by a feed entry; field names match build_video_doc's keys."""
+    video_id: str = ""
+    url: str = ""
+    title: str = ""
+    channel: str = ""
+    channel_url: str = ""
+    upload_date: str = ""
+    _source: str = "pubsubhubbub"
+
+
+def _entry_video_data(entry) -> VideoNotification:
+    """Video fields of one parsed Atom <entry> element."""
+    video_data = VideoNotification()
+    
+    # Extract video ID from link
+    for link in entry.findall(_ATOM_LINK):
+        href = link.get("href", "")
+        if "youtube.com/watch" in href:
+            m = _VID_RE.search(href)
+            if m:
+                video_data.video_id = m.group(1)
+                video_data.url = href
+                logger.debug("Extracted video ID: %s", video_data.video_id)
+            break
+    
+    for key, path in _ENTRY_FIELDS:
+        elem = entry.find(path)
+        if elem is not None and elem.text:
+            setattr(video_data, key, elem.text)
+    
+    # Updated date as fallback
+    if not video_data.upload_date:
+        updated_elem = entry.find(_ATOM_UPDATED)
+        if updated_elem is not None and updated_elem.text:
+            video_data.upload_date = updated_elem.text
+    return video_data
+
+
+# YouTube notifications have a fixed, tiny shape, so the common case is read
+# with regexes over the raw bytes and no element tree is built. If any entry
+# comes out without its required fields (CDATA, prefixed Atom tags, shapes the
+# regexes do not know), the whole body is reparsed with the XML parser.
+_FAST_ENTRY_RE = re.compile(rb"<entry\b[^>]*>(.*?)</entry>", re.S)
+_FAST_LINK_RE = re.compile(rb"""<link\b[^>]*?\bhref=(["'])(.*?)\1""")
+_FAST_FIELDS = (
+    ("title", re.compile(rb"<title\b[^>]*>([^<]+)</title>")),
+    ("channel", re.compile(rb"<name\b[^>]*>([^<]+)</name>")),
+    ("channel_url", re.compile(rb"<uri\b[^>]*>([^<]+)</uri>")),
+    ("upload_date", re.compile(rb"<published\b[^>]*>([^<]+)</published>")),
+)
+_FAST_UPDATED_RE = re.compile(rb"<updated\b[^>]*>([^<]+)</updated>")
+
+
+def _fast_text(raw) -> str:
+    text = raw.decode("utf-8", "replace")
+    return html.unescape(text) if "&" in text else text
+
+
+def _fast_video_data(chunk) -> VideoNotification:
+    """Same fields as _entry_video_data, from the raw bytes of one entry."""
+    video_data = VideoNotification()
+    for m in _FAST_LINK_RE.finditer(chunk):
+        href = _fast_text(m.group(2))
+        if "youtube.com/watch" in href:
+            vid = _VID_RE.search(href)
+            if vid:
+                video_data.video_id = vid.group(1)
+                video_data.url = href
+                logger.debug("Extracted video ID: %s", video_data.video_id)
+            break
+    for key, pattern in _FAST_FIELDS:
+        m = pattern.search(chunk)
+        if m:
+            setattr(video_data, key, _fast_text(m.group(1)))
+    if not video_data.upload_date:
+        m = _FAST_UPDATED_RE.search(chunk)
+        if m:
+            video_data.upload_date = _fast_text(m.group(1))
+    return video_data
+
+
+def _fast_entries(body):
+    """Entries via the regex fast path, or None when the XML parser is needed."""
+    if b"<![CDATA[" in body:
+        return None
+    entries = [_fast_video_data(m.group(1)) for m in _FAST_ENTRY_RE.finditer(body)]
+    for video_data in entries:
+        if not (video_data.video_id and video_data.title and video_data.channel):
+            return None
+    return entries or None
+
+
+def _parse_atom_sync(body) -> list:
+    """All VideoNotifications in a feed body; runs on _XML_POOL, off the event loop."""
+    entries = _fast_entries(body)
+    if entries is None:
+        entries = [_entry_video_data(entry) for entry in _iter_entries(body)]
+    return entries
+
+
+# Parses run here so a long body never stalls the loop; on free-threaded
+# builds (3.13t) they also run in parallel across cores
+_XML_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="atom-parse")
+
+
+async def _read_body(request: Request) -> bytearray:
+    """
+    Read the request body, failing with 413 as soon as it exceeds MAX_BODY_BYTES.
+    The buffer is preallocated from Content-Length and filled in place.
+    """
+    # Plain ASCII digits only: int() would also accept "-5", " 5", "+5" or "1_0"
+    raw_length = request.headers.get("Content-Length", "0")
+    if not (raw_length.isascii() and raw_length.isdigit()):
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    declared = int(raw_length)
+    if declared > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Payload too large")
+    
+    buf = bytearray(declared)
+    view = memoryview(buf)
+    size = 0
+    async for chunk in request.stream():
+        end = size + len(chunk)
+        if end > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Payload too large")
+        if end > len(buf):
+            # no/understated Content-Length: grow past the preallocation
+            view.release()
+            buf[size:] = chunk
+            view = memoryview(buf)
+        else:
+            view[size:end] = chunk
+        size = end
+    view.release()
+    del buf[size:]  # overstated Content-Length
+    return buf
+
 
 @app.get("/webhook")
-async def verify_webhook(request: Request):
+async def verify_webhook(
+    challenge: Optional[str] = Query(None, alias="hub.challenge"),
+    mode: Optional[str] = Query(None, alias="hub.mode"),
+    topic: Optional[str] = Query(None, alias="hub.topic"),
+    lease_seconds: Optional[str] = Query(None, alias="hub.lease_seconds"),
+):
     """
     Handle webhook verification challenge from PubSubHubbub hub.
     Must return plain text response with challenge.
     """
-    challenge = request.query_params.get("hub.challenge")
-    mode = request.query_params.get("hub.mode")
-    topic = request.query_params.get("hub.topic")
-    lease_seconds = request.query_params.get("hub.lease_seconds")
-    
-    logger.info(f"PubSubHubbub Verification Request - Mode: {mode}, Topic: {topic}, Lease: {lease_seconds}s")
+    logger.info("PubSubHubbub Verification Request - Mode: %s, Topic: %s, Lease: %ss", mode, topic, lease_seconds)
     
     if not challenge:
         logger.error("Missing challenge parameter in verification request")
@@ -47,140 +271,192 @@ async def verify_webhook(request: Request):
 
 
 @app.post("/webhook")
-async def handle_webhook(request: Request, background_tasks: BackgroundTasks):
+async def handle_webhook(request: Request):
     """
     Process incoming YouTube video notifications from PubSubHubbub.
     Verifies HMAC signature if secret is configured.
     """
-    logger.info("Received webhook POST request")
+    logger.debug("Received webhook POST request")
     
-    # Get request body for signature verification
-    body = await request.body()
+    # Read once (size-capped); the same buffer is hashed and parsed as bytes
+    body = await _read_body(request)
     
     # Verify signature if secret is configured
     expected_signature = request.headers.get("X-Hub-Signature")
+    if not expected_signature and REQUIRE_SIGNATURE and _HMAC_TEMPLATE is not None:
+        logger.error("Unsigned webhook request rejected (strict mode)")
+        raise HTTPException(status_code=403, detail="Missing signature")
     if expected_signature:
-        secret = os.environ.get("WEBHOOK_SECRET", "").encode()
-        if secret:
-            # PubSubHubbub uses sha1 signature
-            signature = hmac.new(
-                secret, body, hashlib.sha1
-            ).hexdigest()
+        if _HMAC_TEMPLATE is not None:
+            # PubSubHubbub uses sha1 signature, compared as raw bytes rather than hex
+            h = _HMAC_TEMPLATE.copy()
+            h.update(body)
+            signature = h.digest()
             expected_hash = expected_signature.replace("sha1=", "").strip()
+            try:
+                expected_bytes = bytes.fromhex(expected_hash)
+            except ValueError:
+                logger.error("Malformed signature on webhook request")
+                raise HTTPException(status_code=403, detail="Invalid signature")
             
-            if not hmac.compare_digest(signature, expected_hash):
+            # a wrong-length digest can be rejected without walking either buffer
+            if len(signature) != len(expected_bytes) or not hmac.compare_digest(signature, expected_bytes):
                 logger.error("Invalid signature on webhook request")
                 raise HTTPException(status_code=403, detail="Invalid signature")
-            logger.info("Webhook signature verified successfully")
+            logger.debug("Webhook signature verified successfully")
     
     content_type = request.headers.get("Content-Type", "")
     
     # Handle Atom feed (XML) format
     if "application/atom+xml" in content_type or "application/xml" in content_type:
         try:
-            root = ET.fromstring(body.decode('utf-8'))
-            logger.debug(f"XML root tag: {root.tag}")
-            
             # Extract video information from Atom feed
-            # Namespace for Atom
-            ns = {
-                'atom': 'http://www.w3.org/2005/Atom',
-                'yt': 'http://www.youtube.com/xml/schemas/2015/internalstats.xsd'
-            }
-            
-            entries = root.findall("atom:entry", ns)
-            logger.info(f"Found {len(entries)} entries in webhook")
-            
-            for entry in entries:
-                video_data = {}
-                
-                # Extract video ID from link
-                links = entry.findall("atom:link", ns)
-                for link in links:
-                    href = link.get("href", "")
-                    if "youtube.com/watch" in href:
-                        # Extract video ID from URL
-                        if "v=" in href:
-                            video_id = href.split("v=")[1].split("&")[0]
-                            video_data["video_id"] = video_id
-                            video_data["url"] = href
-                            logger.info(f"Extracted video ID: {video_id}")
-                        break
-                
-                # Extract other fields from Atom feed
-                title_elem = entry.find("atom:title", ns)
-                if title_elem is not None and title_elem.text:
-                    video_data["title"] = title_elem.text
-                
-                # Extract author/channel information
-                author_elem = entry.find("atom:author/atom:name", ns)
-                if author_elem is not None and author_elem.text:
-                    video_data["channel"] = author_elem.text
-                
-                author_uri_elem = entry.find("atom:author/atom:uri", ns)
-                if author_uri_elem is not None and author_uri_elem.text:
-                    video_data["channel_url"] = author_uri_elem.text
-                
-                # Extract publish date
-                published_elem = entry.find("atom:published", ns)
-                if published_elem is not None and published_elem.text:
-                    video_data["upload_date"] = published_elem.text
-                
-                # Updated date as fallback
-                updated_elem = entry.find("atom:updated", ns)
-                if updated_elem is not None and updated_elem.text and "upload_date" not in video_data:
-                    video_data["upload_date"] = updated_elem.text
-                
-                # Add source indicator
-                video_data["_source"] = "pubsubhubbub"
+            count = 0
+            loop = asyncio.get_running_loop()
+            entries = await loop.run_in_executor(_XML_POOL, _parse_atom_sync, body)
+            for video_data in entries:
+                count += 1
                 
                 # Validate we have minimum required data
-                if "video_id" in video_data and "title" in video_data:
+                if video_data.video_id and video_data.title:
                     # Process in background to return quickly (as per PubSubHubbub spec)
-                    background_tasks.add_task(process_video_notification, video_data)
-                    logger.info(f"Queued video for processing: {video_data.get('title', video_data.get('video_id'))}")
+                    _queue.put_nowait(video_data)
+                    logger.debug("Queued video for processing: %s", video_data.title)
                 else:
-                    logger.warning(f"Incomplete video data: {video_data}")
+                    logger.warning("Incomplete video data: %s", video_data)
             
-            logger.info(f"Successfully processed webhook with {len(entries)} entries")
-            return {"status": "received", "count": len(entries)}
+            logger.info("Successfully processed webhook with %d entries", count)
+            return {"status": "received", "count": count}
             
-        except ET.ParseError as e:
-            logger.error(f"XML parsing error: {str(e)}")
+        except _XML_ERRORS as e:
+            logger.error("XML parsing error: %s", e)
             raise HTTPException(status_code=400, detail=f"Invalid XML: {str(e)}")
         except Exception as e:
-            logger.error(f"Error processing webhook: {str(e)}", exc_info=True)
+            logger.error("Error processing webhook: %s", e, exc_info=True)
             raise HTTPException(status_code=500, detail=f"Error processing notification: {str(e)}")
     else:
-        logger.error(f"Unsupported content type: {content_type}")
+        logger.error("Unsupported content type: %s", content_type)
         raise HTTPException(status_code=400, detail="Unsupported content type")
 
 
-def process_video_notification(video_data: dict):
+# Notifications are buffered and written in batches: up to BATCH_SIZE docs,
+# or whatever arrived before the queue stayed idle for BATCH_WAIT_SECONDS
+BATCH_SIZE = 64
+BATCH_WAIT_SECONDS = 0.05
+
+_queue: asyncio.Queue = None
+_drain_task: asyncio.Task = None
+
+# Hub re-deliveries of a video written in the last DEDUPE_TTL_SECONDS are
+# dropped before any document is built; edits arriving later still go through
+DEDUPE_TTL_SECONDS = int(os.environ.get("WEBHOOK_DEDUPE_TTL", 60))
+DEDUPE_MAXSIZE = 10000
+_recent: dict = {}  # video_id -> expiry (monotonic), oldest first
+
+
+def _unseen(batch: list) -> list:
+    now = time.monotonic()
+    return [video_data for video_data in batch if _recent.get(video_data.video_id, 0) <= now]
+
+
+def _remember(batch: list):
+    now = time.monotonic()
+    expires = now + DEDUPE_TTL_SECONDS
+    for video_data in batch:
+        _recent.pop(video_data.video_id, None)  # re-insert so order tracks expiry
+        _recent[video_data.video_id] = expires
+    while _recent:
+        oldest = next(iter(_recent))
+        if len(_recent) <= DEDUPE_MAXSIZE and _recent[oldest] > now:
+            break
+        del _recent[oldest]
+
+
+async def process_video_batch(batch: list):
     """
-    Process the video notification in the background.
-    Builds database document and upserts video metadata.
+    Process queued video notifications in the background.
+    Builds database documents and upserts them in one bulk write on the
+    event loop (motor), so no thread handoff is needed per batch.
     """
+    fresh = _unseen(batch)
+    if len(fresh) < len(batch):
+        logger.debug("Skipped %d recently written notifications", len(batch) - len(fresh))
+    if not fresh:
+        return
     try:
-        logger.info(f"Processing video: {video_data.get('video_id', 'unknown')}")
-        
-        # Build document from raw data
-        doc = build_video_doc(video_data)
-        
-        # Upsert into database
-        is_new = upsert_video(doc)
-        
-        action = "Inserted" if is_new else "Updated"
-        logger.info(f"{action} video: {doc['video_id']} - {doc['title']}")
-        
+        docs = [build_video_doc(video_data) for video_data in fresh]
+        inserted, modified = await bulk_upsert_videos_async(docs)
+        _remember(fresh)
+        logger.info("Upserted %d videos (%d new, %d updated)", len(docs), inserted, modified)
     except Exception as e:
-        logger.error(f"Error processing video notification for {video_data.get('video_id')}: {str(e)}", exc_info=True)
+        ids = [video_data.video_id for video_data in batch]
+        logger.error("Error processing video notifications for %s: %s", ids, e, exc_info=True)
+
+
+_STOP = object()  # queued at shutdown, behind any notifications still waiting
+
+
+async def _drain_worker():
+    stopping = False
+    while not stopping:
+        item = await _queue.get()
+        if item is _STOP:
+            return
+        batch = [item]
+        with suppress(asyncio.TimeoutError):
+            while len(batch) < BATCH_SIZE:
+                item = await asyncio.wait_for(_queue.get(), BATCH_WAIT_SECONDS)
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+        await process_video_batch(batch)
+
+
+@app.on_event("startup")
+async def _start_drain_worker():
+    global _queue, _drain_task
+    # connect and create indexes once, off the loop, before the first batch
+    await asyncio.to_thread(get_videos_collection, True)
+    _queue = asyncio.Queue()
+    _drain_task = asyncio.create_task(_drain_worker())
+
+
+@app.on_event("shutdown")
+async def _stop_drain_worker():
+    # let the worker write its in-flight batch and everything queued before
+    # the sentinel, rather than cancelling it mid-batch
+    _queue.put_nowait(_STOP)
+    await _drain_task
+
+
+# Liveness probes get a prebuilt body whose timestamp a background tick
+# refreshes once a second, instead of formatting a datetime per hit
+_health = {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat(), "service": "webhook"}
+_health_task: asyncio.Task = None
+
+
+async def _health_tick():
+    while True:
+        await asyncio.sleep(1)
+        _health["timestamp"] = datetime.now(timezone.utc).isoformat()
+
+
+@app.on_event("startup")
+async def _start_health_tick():
+    global _health_task
+    _health_task = asyncio.create_task(_health_tick())
+
+
+@app.on_event("shutdown")
+async def _stop_health_tick():
+    _health_task.cancel()
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for container orchestration"""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat(), "service": "webhook"}
+    return _health
 
 
 @app.get("/")
@@ -190,4 +466,8 @@ async def root():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
+    uvicorn.run(
+        app, host="0.0.0.0", port=8080,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools", access_log=False,
+    )
\ No newline at end of file